@@ -0,0 +1,288 @@
+import hashlib
+import os
+import pickle
+import socket
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, date
+from urllib.parse import urlparse
+
+GENERATION_KEY = 'generation'
+TTL_SECONDS = 300
+
+
+class MemoryBackend:
+    """Least-recently-used entries in this process. Each worker process has its own copy."""
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._generation = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if time.time() >= expires_at:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.time() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def generation(self):
+        return self._generation
+
+    def bump_generation(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+
+class FileBackend:
+    """One pickle file per entry under `directory`, shared by every process on the host.
+
+    Files are written to a temporary name and renamed into place, so readers never see a
+    partial entry. Expired files are removed when read; stale generations simply stop being hit.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key)
+
+    def _write(self, key, payload):
+        fd, tmp = tempfile.mkstemp(dir=self.directory, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(payload)
+            os.replace(tmp, self._path(key))
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+    def get(self, key):
+        try:
+            with open(self._path(key), 'rb') as f:
+                expires_at, value = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+        if time.time() >= expires_at:
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+            return None
+        return value
+
+    def set(self, key, value, ttl):
+        self._write(key, pickle.dumps((time.time() + ttl, value), pickle.HIGHEST_PROTOCOL))
+
+    def generation(self):
+        try:
+            with open(self._path(GENERATION_KEY)) as f:
+                return int(f.read() or 0)
+        except (OSError, ValueError):
+            return 0
+
+    def bump_generation(self):
+        # Not atomic across processes, but two racing bumps still move past the old generation.
+        self._write(GENERATION_KEY, str(self.generation() + 1).encode())
+
+
+class RespError(Exception):
+    pass
+
+
+class RespBackend:
+    """Entries in a Redis-protocol server (Redis, Valkey, or any local stand-in speaking RESP).
+
+    Only GET, SET ... EX and INCR are used, over one socket per request thread.
+    """
+
+    def __init__(self, url, prefix='dashboard-an:results:', timeout=2):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or 'localhost'
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        self.db = int(parsed.path.lstrip('/') or 0)
+        self.prefix = prefix
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connect(self):
+        sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        self._local.sock = sock
+        self._local.reader = sock.makefile('rb')
+        try:
+            if self.password:
+                self._call('AUTH', self.password)
+            if self.db:
+                self._call('SELECT', self.db)
+        except BaseException:
+            # Not left half set up for the next command to reuse.
+            self._reset()
+            raise
+
+    def _reset(self):
+        sock = getattr(self._local, 'sock', None)
+        reader = getattr(self._local, 'reader', None)
+        self._local.sock = None
+        self._local.reader = None
+        if reader is not None:
+            reader.close()
+        if sock is not None:
+            sock.close()
+
+    def _read(self):
+        line = self._local.reader.readline()
+        if not line:
+            raise ConnectionError("RESP server closed the connection")
+        kind, rest = line[:1], line[1:-2]
+        if kind == b'+':
+            return rest.decode()
+        if kind == b'-':
+            raise RespError(rest.decode())
+        if kind == b':':
+            return int(rest)
+        if kind == b'$':
+            length = int(rest)
+            if length < 0:
+                return None
+            data = self._local.reader.read(length + 2)
+            return data[:-2]
+        if kind == b'*':
+            length = int(rest)
+            return None if length < 0 else [self._read() for _ in range(length)]
+        raise RespError(f"unexpected RESP reply {line!r}")
+
+    def _call(self, *args):
+        parts = [f"*{len(args)}\r\n".encode()]
+        for arg in args:
+            if not isinstance(arg, bytes):
+                arg = str(arg).encode()
+            parts.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+        self._local.sock.sendall(b''.join(parts))
+        return self._read()
+
+    def command(self, *args):
+        """Run one command, reconnecting once if the pooled socket went away."""
+        for attempt in (1, 2):
+            if getattr(self._local, 'sock', None) is None:
+                self._connect()
+            try:
+                return self._call(*args)
+            except (OSError, ConnectionError):
+                self._reset()
+                if attempt == 2:
+                    raise
+
+    def get(self, key):
+        data = self.command('GET', self.prefix + key)
+        return None if data is None else pickle.loads(data)
+
+    def set(self, key, value, ttl):
+        self.command('SET', self.prefix + key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), 'EX', max(int(ttl), 1))
+
+    def generation(self):
+        return int(self.command('GET', self.prefix + GENERATION_KEY) or 0)
+
+    def bump_generation(self):
+        self.command('INCR', self.prefix + GENERATION_KEY)
+
+
+def normalize(value):
+    """A stable, hashable form of a filter value: lists are deduplicated and sorted, dates made ISO."""
+    if isinstance(value, dict):
+        return tuple(sorted((k, normalize(v)) for k, v in value.items()))
+    if isinstance(value, (list, set, frozenset)):
+        return tuple(sorted({normalize(v) for v in value}, key=repr))
+    if isinstance(value, tuple):
+        return tuple(normalize(v) for v in value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+class ResultCache:
+    """Computed route results keyed by view name and normalized filter parameters.
+
+    Every key includes the backend's generation number, so invalidate() - called after any
+    commit that wrote tickets or cases - makes all earlier entries unreachable at once; they
+    then age out through their TTL. With the memory backend other worker processes only see
+    new data once their own entries expire.
+
+    Configured by RESULT_CACHE ('memory', 'filesystem', 'redis' or None to disable),
+    RESULT_CACHE_TTL, RESULT_CACHE_DIR and RESULT_CACHE_URL.
+    """
+
+    def __init__(self, app=None):
+        self.backend = None
+        self.ttl = TTL_SECONDS
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        kind = app.config.get('RESULT_CACHE')
+        self.ttl = app.config.get('RESULT_CACHE_TTL', TTL_SECONDS)
+        if kind == 'memory':
+            self.backend = MemoryBackend(app.config.get('RESULT_CACHE_MAX_ENTRIES', 256))
+        elif kind == 'filesystem':
+            self.backend = FileBackend(app.config.get('RESULT_CACHE_DIR') or os.path.join(app.instance_path, 'result-cache'))
+        elif kind == 'redis':
+            self.backend = RespBackend(app.config.get('RESULT_CACHE_URL', 'redis://localhost:6379/0'))
+        elif kind:
+            raise ValueError(f"unknown RESULT_CACHE backend {kind!r}")
+        else:
+            self.backend = None
+
+    def key(self, name, params, generation):
+        digest = hashlib.sha256(repr((name, normalize(params))).encode()).hexdigest()
+        return f"{name}-{generation}-{digest}"
+
+    def get_or_compute(self, name, params, compute):
+        """Return the cached result of `compute()` for (name, params), computing it on a miss.
+
+        A backend that cannot be reached is treated as a miss, so the page still renders.
+        """
+        if self.backend is None:
+            return compute()
+        try:
+            key = self.key(name, params, self.backend.generation())
+            value = self.backend.get(key)
+        except (OSError, RespError):
+            return compute()
+        if value is not None:
+            return value
+
+        value = compute()
+        try:
+            self.backend.set(key, value, self.ttl)
+        except (OSError, RespError):
+            pass
+        return value
+
+    def invalidate(self):
+        if self.backend is None:
+            return
+        try:
+            self.backend.bump_generation()
+        except (OSError, RespError):
+            pass
+
+
+result_cache = ResultCache()
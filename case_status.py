@@ -0,0 +1,94 @@
+from datetime import datetime
+
+from sqlalchemy import select, case, or_
+
+from extensions import db
+from models import Ticket, NomorTicket, History, JAKARTA_TZ
+from rollups import refresh_case_summary, refresh_staff_counters
+from statistik import refresh_ticket_daily
+from sla import sla_after_transition
+
+ticket = Ticket.__table__
+nomor_ticket = NomorTicket.__table__
+history = History.__table__
+
+
+def by_ticket_id(values, column):
+    """`column` set per ticket id from `values`; tickets not in `values` keep what they have."""
+    return case(values, value=ticket.c.id, else_=column)
+
+
+def transition_case(case_id, status_ticket, user_id, case_status=None, session=None):
+    """Move every ticket of case `case_id` to `status_ticket` and return the number of tickets changed.
+
+    Runs in the session's transaction, so it commits or rolls back with the caller:
+    one UPDATE for the tickets (their SLA paused or resumed as the status listener would),
+    one bulk insert of a History row per changed ticket, and one UPDATE of the case for
+    change_date and, if given, its `case_status` (plus closed_ticket when closing).
+
+    The statements bypass the ORM listeners, so the rollups are refreshed here: case_summary,
+    staff_counter and ticket_daily, which counts tickets per status.
+    """
+    session = session or db.session
+    session.flush()
+    connection = session.connection()
+    now = datetime.now(JAKARTA_TZ)
+
+    rows = connection.execute(
+        select(
+            ticket.c.id, ticket.c.status_ticket, ticket.c.sla_due_at, ticket.c.sla,
+            ticket.c.order_no, ticket.c.tahapan, ticket.c.nama_os, ticket.c.input_by, ticket.c.tanggal
+        )
+        .where(
+            ticket.c.nomor_ticket_id == case_id,
+            or_(ticket.c.status_ticket != status_ticket, ticket.c.status_ticket.is_(None))
+        )
+        .order_by(ticket.c.id)
+        .with_for_update()
+    ).all()
+    if not rows and case_status is None:
+        return 0
+
+    case_values = {'change_date': now}
+    if case_status is not None:
+        case_values['status'] = case_status
+    if case_status == 'close':
+        case_values['closed_ticket'] = now
+    connection.execute(nomor_ticket.update().where(nomor_ticket.c.id == case_id).values(**case_values))
+
+    if rows:
+        ids = [row.id for row in rows]
+        values = {'status_ticket': status_ticket}
+        sla_changes = {}
+        for row in rows:
+            after = sla_after_transition(row.status_ticket, status_ticket, row.sla_due_at, row.sla)
+            if after != (row.sla_due_at, row.sla):
+                sla_changes[row.id] = after
+        if sla_changes:
+            # Each value depends on the id only, so MySQL evaluating SET left to right is harmless.
+            values['sla_due_at'] = by_ticket_id({id: due_at for id, (due_at, _) in sla_changes.items()}, ticket.c.sla_due_at)
+            values['sla'] = by_ticket_id({id: days for id, (_, days) in sla_changes.items()}, ticket.c.sla)
+        connection.execute(ticket.update().where(ticket.c.id.in_(ids)).values(**values))
+
+        number = connection.execute(select(nomor_ticket.c.nomor_ticket).where(nomor_ticket.c.id == case_id)).scalar()
+        connection.execute(history.insert(), [{
+            'nomor_ticket': number,
+            'tanggal': now,
+            'order_number': row.order_no,
+            'status_ticket': status_ticket,
+            'tahapan': row.tahapan,
+            'nama_os': row.nama_os,
+            'create_by': user_id
+        } for row in rows])
+
+        refresh_staff_counters(connection, {row.input_by for row in rows})
+        refresh_ticket_daily(connection, {row.tanggal for row in rows})
+    refresh_case_summary(connection, [case_id])
+
+    # The session still holds what it loaded before these statements.
+    for mapper, key in [(NomorTicket, case_id)] + [(Ticket, row.id) for row in rows]:
+        loaded = session.identity_map.get(session.identity_key(mapper, key))
+        if loaded is not None:
+            session.expire(loaded)
+    session.info['data_changed'] = True
+    return len(rows)
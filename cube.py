@@ -0,0 +1,125 @@
+import threading
+
+import numpy as np
+
+NO_DAY = -1
+
+
+class CountCube:
+    """Per-day ticket counts held as NumPy columns, answering ticket_counts() without SQL.
+
+    Each row is (day ordinal, one code per dimension, count), i.e. one ticket_daily row.
+    Dimension values are dictionary-encoded, so filters become boolean lookups over the
+    dictionary and grouping is a bincount over the combined codes.
+
+    With `fold_case` values are compared the way MySQL's default *_ci collations do
+    (case-insensitive, trailing spaces ignored), including when grouping.
+    """
+
+    def __init__(self, dimensions, fold_case=False):
+        self.dimensions = tuple(dimensions)
+        self.fold_case = fold_case
+        self._lock = threading.Lock()
+        self._days = np.empty(0, dtype=np.int32)
+        self._codes = {name: np.empty(0, dtype=np.int32) for name in self.dimensions}
+        self._counts = np.empty(0, dtype=np.int64)
+        self._values = {name: [] for name in self.dimensions}
+        self._lookup = {name: {} for name in self.dimensions}
+
+    def _key(self, value):
+        if value is None:
+            return None
+        value = str(value)
+        if self.fold_case:
+            return value.rstrip(' ').lower()
+        return value
+
+    def _encode(self, name, value):
+        lookup = self._lookup[name]
+        code = lookup.get(value)
+        if code is None:
+            code = lookup[value] = len(self._values[name])
+            self._values[name].append(value)
+        return code
+
+    def replace_days(self, days, rows):
+        """Drop every row of `days` (None for rows without a date) and add `rows` in their place.
+
+        `rows` are (day, *dimension values, count) tuples; passing days=None replaces everything.
+        """
+        ordinals = [NO_DAY if row[0] is None else row[0].toordinal() for row in rows]
+        codes = {
+            name: [self._encode(name, row[i + 1]) for row in rows]
+            for i, name in enumerate(self.dimensions)
+        }
+        counts = [row[-1] for row in rows]
+
+        with self._lock:
+            if days is None:
+                keep = np.zeros(len(self._days), dtype=bool)
+            else:
+                dropped = [NO_DAY if d is None else d.toordinal() for d in days]
+                keep = ~np.isin(self._days, np.array(dropped, dtype=np.int32))
+
+            self._days = np.concatenate([self._days[keep], np.array(ordinals, dtype=np.int32)])
+            for name in self.dimensions:
+                self._codes[name] = np.concatenate([self._codes[name][keep], np.array(codes[name], dtype=np.int32)])
+            self._counts = np.concatenate([self._counts[keep], np.array(counts, dtype=np.int64)])
+
+    def day_ordinals(self):
+        return set(np.unique(self._days).tolist())
+
+    def _table(self, name, predicate):
+        return np.array([predicate(value) for value in self._values[name]], dtype=bool)
+
+    def ticket_counts(self, group_by, start=None, end=None, kanal=None, non_empty=(), **in_filters):
+        """Same arguments and result as statistik.sql_ticket_counts."""
+        with self._lock:
+            days = self._days
+            codes = dict(self._codes)
+            counts = self._counts
+            values = {name: list(self._values[name]) for name in self.dimensions}
+
+        mask = np.ones(len(days), dtype=bool)
+        if start and end:
+            mask &= (days >= start.toordinal()) & (days <= end.toordinal()) & (days != NO_DAY)
+        if kanal:
+            wanted = self._key(kanal.upper())
+            table = self._table('kanal_pengaduan', lambda v: v is not None and self._key(v.upper()) == wanted)
+            mask &= table[codes['kanal_pengaduan']]
+        for name in non_empty:
+            table = self._table(name, lambda v: v is not None and self._key(v) != self._key(''))
+            mask &= table[codes[name]]
+        for name, selected in in_filters.items():
+            if selected:
+                wanted = {self._key(v) for v in selected}
+                table = self._table(name, lambda v: v is not None and self._key(v) in wanted)
+                mask &= table[codes[name]]
+
+        if not mask.any():
+            return []
+
+        # Map every code to the first code with the same comparison key, so values the
+        # database would consider equal land in one group.
+        canonical = {}
+        labels = {}
+        for name in group_by:
+            first = {}
+            canonical[name] = np.array(
+                [first.setdefault(self._key(v), code) for code, v in enumerate(values[name])],
+                dtype=np.int64
+            )
+            labels[name] = values[name]
+
+        selected_counts = counts[mask]
+        if not group_by:
+            return [(int(selected_counts.sum()),)]
+
+        stacked = np.stack([canonical[name][codes[name][mask]] for name in group_by], axis=1)
+        groups, inverse = np.unique(stacked, axis=0, return_inverse=True)
+        totals = np.bincount(inverse.ravel(), weights=selected_counts, minlength=len(groups))
+
+        return [
+            (*(labels[name][code] for name, code in zip(group_by, group)), int(total))
+            for group, total in zip(groups.tolist(), totals)
+        ]
@@ -0,0 +1,82 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from sqlalchemy import or_, and_
+
+
+def encode_cursor(direction, created, row_id):
+    """Opaque token for the row at (created, row_id), walking `direction` ('next' or 'prev')."""
+    payload = json.dumps({'d': direction, 't': created.isoformat(), 'i': row_id})
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Return (direction, created, row_id), or None for an empty or tampered token."""
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        direction = payload['d']
+        if direction not in ('next', 'prev'):
+            return None
+        return direction, datetime.fromisoformat(payload['t']), int(payload['i'])
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        return None
+
+
+def before(created_col, id_col, created, row_id):
+    """Rows after the cursor in (created desc, id desc) order."""
+    return or_(created_col < created, and_(created_col == created, id_col < row_id))
+
+
+def after(created_col, id_col, created, row_id):
+    """Rows before the cursor in (created desc, id desc) order."""
+    return or_(created_col > created, and_(created_col == created, id_col > row_id))
+
+
+class CursorPage:
+    """A keyset page, newest first. Templates use next_cursor / prev_cursor instead of page numbers."""
+
+    def __init__(self, items, key, direction, has_more, has_cursor):
+        self.items = items
+        self.per_page = len(items)
+        if direction == 'prev':
+            self.has_prev = has_more
+            self.has_next = has_cursor
+        else:
+            self.has_prev = has_cursor
+            self.has_next = has_more
+        self.next_cursor = encode_cursor('next', *key(items[-1])) if items and self.has_next else None
+        self.prev_cursor = encode_cursor('prev', *key(items[0])) if items and self.has_prev else None
+
+
+def keyset_paginate(query, created_col, id_col, cursor=None, per_page=10, key=None):
+    """Page `query` newest first on (created_col, id_col) without OFFSET.
+
+    Each page is one index range scan from the cursor, so page N costs the same as page 1.
+    `key` maps a row to its (created, id) pair; by default the attributes named like the columns.
+    """
+    if key is None:
+        key = lambda row: (getattr(row, created_col.key), getattr(row, id_col.key))
+
+    decoded = decode_cursor(cursor)
+    direction = decoded[0] if decoded else 'next'
+
+    if decoded and direction == 'prev':
+        query = query.filter(after(created_col, id_col, decoded[1], decoded[2]))\
+            .order_by(created_col.asc(), id_col.asc())
+    else:
+        if decoded:
+            query = query.filter(before(created_col, id_col, decoded[1], decoded[2]))
+        query = query.order_by(created_col.desc(), id_col.desc())
+
+    rows = query.limit(per_page + 1).all()
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if direction == 'prev':
+        rows.reverse()
+
+    return CursorPage(rows, key, direction, has_more, decoded is not None)
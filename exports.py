@@ -0,0 +1,311 @@
+import csv
+import io
+import os
+import tempfile
+import zlib
+from datetime import date, datetime, timedelta
+
+import xlsxwriter
+from sqlalchemy import select, func
+
+from extensions import db
+from models import Ticket, NomorTicket, local_now
+
+CHUNK_SIZE = 1000
+
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+# format: (file extension, mimetype)
+EXPORT_FORMATS = {
+    'xlsx': ('xlsx', XLSX_MIMETYPE),
+    'csv': ('csv', 'text/csv'),
+    'csv.gz': ('csv.gz', 'application/gzip'),
+    'parquet': ('parquet', 'application/vnd.apache.parquet'),
+    'arrow': ('arrow', 'application/vnd.apache.arrow.file')
+}
+
+# Formats that can be sent while they are being written; the others need the whole file first.
+STREAMED_FORMATS = ('csv', 'csv.gz')
+
+STATUS_TICKET_LABELS = {
+    '1': 'Aktif',
+    '2': 'Perpanjangan',
+    '3': 'Keberatan',
+    '4': 'Tutup',
+    '5': 'Reopen'
+}
+
+JENIS_PENGADUAN_LABELS = {
+    '1': "Informasi Pengajuan",
+    '2': "Permintaan Kode OTP",
+    '3': "Informasi Tenor",
+    '4': "Informasi Tagihan",
+    '5': "Informasi Denda",
+    '6': "Pembatalan Pinjaman",
+    '7': "Informasi Pencairan Dana",
+    '8': "Perilaku Petugas Penagihan",
+    '9': "Informasi Pembayaran",
+    '10': "Discount / Pemutihan"
+}
+
+HEADERS = [
+    "Channel", "Tanggal", "No Ticket", "Order No", "Name", "Customer Phone Number", "Email", "NIK",
+    "Detail Problem", "Tipe Pengaduan", "Detail Pengaduan", "Deskripsi Pengaduan", "Status Ticket",
+    "DC", "OS", "Bucket", "Screenshoot Chat"
+]
+
+# Appended for incremental exports, so downstream syncs can upsert by ticket.
+INCREMENTAL_HEADERS = ["Ticket ID", "Change Date"]
+
+# Transactions commit a little after the listeners stamp change_date, so the next watermark
+# trails the export by this much; rows in the overlap come again in the next delta.
+WATERMARK_OVERLAP = timedelta(minutes=2)
+
+
+def export_headers(since=None):
+    return HEADERS + INCREMENTAL_HEADERS if since is not None else HEADERS
+
+
+def export_criteria(start=None, end=None, since=None):
+    """Tickets dated within [start, end], and/or whose case changed at or after `since`."""
+    criteria = []
+    if start and end:
+        criteria += [Ticket.tanggal >= start, Ticket.tanggal <= end]
+    if since is not None:
+        criteria.append(NomorTicket.change_date >= since)
+    return criteria
+
+
+def next_watermark():
+    """The `since` to pass to the next incremental export, taken before this one starts."""
+    return local_now() - WATERMARK_OVERLAP
+
+
+def export_query(start=None, end=None, since=None):
+    """Only the exported columns, with the ticket number joined in, newest first."""
+    columns = [
+        Ticket.kanal_pengaduan,
+        Ticket.tanggal,
+        NomorTicket.nomor_ticket,
+        Ticket.order_no,
+        Ticket.nama_nasabah,
+        Ticket.nomor_utama,
+        Ticket.email,
+        Ticket.nik,
+        Ticket.detail_pengaduan,
+        Ticket.jenis_pengaduan,
+        Ticket.deskripsi_pengaduan,
+        Ticket.status_ticket,
+        Ticket.nama_dc,
+        Ticket.nama_os,
+        Ticket.nama_bucket,
+        Ticket.bukti_chat
+    ]
+    if since is not None:
+        columns += [Ticket.id.label('ticket_id'), NomorTicket.change_date]
+    return select(*columns)\
+        .outerjoin(NomorTicket, NomorTicket.id == Ticket.nomor_ticket_id)\
+        .where(*export_criteria(start, end, since))\
+        .order_by(Ticket.tanggal.desc(), Ticket.id.desc())
+
+
+def has_tickets(start=None, end=None, since=None):
+    return db.session.query(Ticket.id)\
+        .outerjoin(NomorTicket, NomorTicket.id == Ticket.nomor_ticket_id)\
+        .filter(*export_criteria(start, end, since)).first() is not None
+
+
+def count_tickets(start=None, end=None, since=None):
+    return db.session.query(func.count(Ticket.id))\
+        .outerjoin(NomorTicket, NomorTicket.id == Ticket.nomor_ticket_id)\
+        .filter(*export_criteria(start, end, since)).scalar()
+
+
+def export_row(row, upload_url, since=None):
+    file_links = ''
+    if row.bukti_chat:
+        filenames = [f.strip() for f in row.bukti_chat.split(',') if f.strip()]
+        file_links = ', '.join([f"{upload_url}/{filename}" for filename in filenames])
+
+    values = [
+        row.kanal_pengaduan,
+        row.tanggal.date() if row.tanggal else None,
+        row.nomor_ticket or '',
+        row.order_no,
+        row.nama_nasabah,
+        row.nomor_utama,
+        row.email,
+        row.nik,
+        row.detail_pengaduan,
+        JENIS_PENGADUAN_LABELS.get(str(row.jenis_pengaduan), row.jenis_pengaduan),
+        row.detail_pengaduan,
+        row.deskripsi_pengaduan,
+        STATUS_TICKET_LABELS.get(str(row.status_ticket), row.status_ticket),
+        row.nama_dc,
+        row.nama_os,
+        row.nama_bucket,
+        file_links
+    ]
+    if since is not None:
+        values += [row.ticket_id, row.change_date]
+    return values
+
+
+def export_chunks(start, end, upload_url, since=None, chunk_size=CHUNK_SIZE):
+    """Yield lists of at most `chunk_size` export rows.
+
+    The rows come from a server-side cursor, so only one chunk is held in memory at a time.
+    """
+    with db.engine.connect() as connection:
+        result = connection.execution_options(stream_results=True, yield_per=chunk_size)\
+            .execute(export_query(start, end, since))
+        for partition in result.partitions():
+            yield [export_row(row, upload_url, since) for row in partition]
+
+
+def xlsx_cell(value):
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(value, date):
+        return value.strftime('%Y-%m-%d')
+    return value
+
+
+def write_xlsx(chunks, fileobj, headers=HEADERS):
+    """Write the export to `fileobj` one row at a time.
+
+    constant_memory makes xlsxwriter flush each row to a temporary file as soon as the next
+    one starts, so memory use does not grow with the number of rows.
+    """
+    workbook = xlsxwriter.Workbook(fileobj, {'constant_memory': True})
+    worksheet = workbook.add_worksheet('Tickets')
+    header_format = workbook.add_format({'bold': True, 'border': 1, 'align': 'center', 'valign': 'top'})
+    worksheet.write_row(0, 0, headers, header_format)
+
+    row_number = 1
+    for chunk in chunks:
+        for values in chunk:
+            worksheet.write_row(row_number, 0, [xlsx_cell(v) for v in values])
+            row_number += 1
+    workbook.close()
+    return row_number - 1
+
+
+def csv_stream(chunks, headers=HEADERS):
+    """Yield the export as CSV text, one encoded piece per chunk of rows."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # A byte order mark so Excel opens the file as UTF-8.
+    buffer.write('\ufeff')
+    writer.writerow(headers)
+    for chunk in chunks:
+        writer.writerows(chunk)
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+def gzip_stream(pieces):
+    """Gzip a stream of byte strings without holding more than one piece."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for piece in pieces:
+        compressed = compressor.compress(piece)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def arrow_schema(headers=HEADERS):
+    import pyarrow as pa
+
+    types = {"Tanggal": pa.date32(), "Ticket ID": pa.int64(), "Change Date": pa.timestamp('us')}
+    return pa.schema([pa.field(name, types.get(name, pa.string())) for name in headers])
+
+
+def record_batches(chunks, schema):
+    """One Arrow record batch per chunk, keeping the typed columns of `schema`."""
+    import pyarrow as pa
+
+    for chunk in chunks:
+        columns = list(zip(*chunk)) if chunk else [()] * len(schema)
+        arrays = []
+        for field, values in zip(schema, columns):
+            if field.type == pa.string():
+                values = [None if v is None else str(v) for v in values]
+            arrays.append(pa.array(values, type=field.type))
+        yield pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def write_parquet(chunks, fileobj, headers=HEADERS):
+    import pyarrow.parquet as pq
+
+    schema = arrow_schema(headers)
+    with pq.ParquetWriter(fileobj, schema, compression='zstd') as writer:
+        for batch in record_batches(chunks, schema):
+            writer.write_batch(batch)
+
+
+def write_arrow(chunks, fileobj, headers=HEADERS):
+    import pyarrow as pa
+
+    schema = arrow_schema(headers)
+    options = pa.ipc.IpcWriteOptions(compression='zstd')
+    with pa.ipc.new_file(fileobj, schema, options=options) as writer:
+        for batch in record_batches(chunks, schema):
+            writer.write_batch(batch)
+
+
+def stream_export(chunks, export_format, headers=HEADERS):
+    """Yield the bytes of a streamed format (see STREAMED_FORMATS)."""
+    if export_format == 'csv.gz':
+        return gzip_stream(csv_stream(chunks, headers))
+    return csv_stream(chunks, headers)
+
+
+def write_export(chunks, export_format, fileobj, headers=HEADERS):
+    if export_format in STREAMED_FORMATS:
+        for piece in stream_export(chunks, export_format, headers):
+            fileobj.write(piece)
+    elif export_format == 'parquet':
+        write_parquet(chunks, fileobj, headers)
+    elif export_format == 'arrow':
+        write_arrow(chunks, fileobj, headers)
+    else:
+        write_xlsx(chunks, fileobj, headers)
+
+
+def export_file(export_format, start, end, upload_url, since=None):
+    """The export as an anonymous temporary file, rewound and ready to send."""
+    output = tempfile.TemporaryFile()
+    write_export(export_chunks(start, end, upload_url, since), export_format, output, export_headers(since))
+    output.seek(0)
+    return output
+
+
+def reporting(chunks, progress):
+    processed = 0
+    for chunk in chunks:
+        yield chunk
+        processed += len(chunk)
+        progress(processed)
+
+
+def export_to_file(path, export_format, start, end, upload_url, progress=None, since=None):
+    """Write the export to `path` for a background job, reporting rows written after each chunk.
+
+    The file is written next to `path` and renamed into place once complete.
+    """
+    chunks = export_chunks(start, end, upload_url, since)
+    if progress is not None:
+        progress(0, count_tickets(start, end, since))
+        chunks = reporting(chunks, progress)
+
+    partial = path + '.part'
+    with open(partial, 'wb') as output:
+        write_export(chunks, export_format, output, export_headers(since))
+    os.replace(partial, path)
+    return path
@@ -0,0 +1,294 @@
+import csv
+import os
+from datetime import datetime, date
+
+import pandas as pd
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+
+from cache import result_cache
+from extensions import db
+from models import Ticket, NomorTicket, OrderClaim, MISSING_NAMES
+from rollups import refresh_case_summary, refresh_staff_counters
+from sla_warnings import sla_warnings
+from statistik import refresh_ticket_daily
+from ticket_numbers import reserve_ticket_numbers
+
+CHUNK_SIZE = 500
+
+ticket = Ticket.__table__
+nomor_ticket = NomorTicket.__table__
+order_claim = OrderClaim.__table__
+
+IMPORT_COLUMNS = [
+    'kanal_pengaduan', 'tanggal', 'nama_nasabah', 'tipe_pengaduan',
+    'detail_pengaduan', 'order_no', 'os', 'dc', 'bucket'
+]
+
+JENIS_PENGADUAN_CODES = {
+    "Informasi Pengajuan": '1',
+    "Permintaan Kode OTP": '2',
+    "Informasi Tenor": '3',
+    "Informasi Tagihan": '4',
+    "Informasi Denda": '5',
+    "Pembatalan Pinjaman": '6',
+    "Informasi Pencairan Dana": '7',
+    "Perilaku Petugas Penagihan": '8',
+    "Informasi Pembayaran": '9',
+    "Discount / Pemutihan": '10'
+}
+
+
+class SheetError(ValueError):
+    pass
+
+
+class ImportResult:
+    """What an import did: rows read, rows inserted, rows skipped as duplicate order numbers,
+    and (row number, message) pairs for rows that were rejected. Row numbers are Excel rows."""
+
+    def __init__(self, parsed=0):
+        self.parsed = parsed
+        self.inserted = 0
+        self.duplicates = 0
+        self.errors = []
+
+    def reject(self, rows, message):
+        self.errors.extend((row, message) for row in rows)
+
+    @property
+    def rejected(self):
+        return len({row for row, _ in self.errors})
+
+    @property
+    def processed(self):
+        return self.inserted + self.duplicates + self.rejected
+
+    def summary(self):
+        return {
+            'parsed': self.parsed,
+            'inserted': self.inserted,
+            'duplicates': self.duplicates,
+            'rejected': self.rejected
+        }
+
+
+def text_column(series):
+    """Cell values as stripped strings, None where the cell is empty."""
+    present = series.notna()
+    values = pd.Series(None, index=series.index, dtype=object)
+    values[present] = series[present].astype(str).str.strip()
+    return values
+
+
+def empty_as_none(values):
+    return values.where(values.fillna('') != '', None)
+
+
+def blank_missing_names(values):
+    """The vectorized Ticket.normalize_names: empty cells, '-' and 'None' become ''."""
+    return values.where(values.notna() & ~values.fillna('').str.strip().isin(MISSING_NAMES), '')
+
+
+def parse_tanggal(series, default):
+    """Datetimes for the tanggal column: Excel dates as they are, text as YYYY-MM-DD, empty cells
+    as `default`. Returns (values, invalid mask)."""
+    is_text = series.map(lambda v: isinstance(v, str))
+    is_date = series.map(lambda v: isinstance(v, (datetime, date)))
+
+    parsed = pd.Series(pd.NaT, index=series.index, dtype='datetime64[ns]')
+    parsed[is_text] = pd.to_datetime(series[is_text].str.strip(), format='%Y-%m-%d', errors='coerce')
+    parsed[is_date] = pd.to_datetime(series[is_date], errors='coerce')
+
+    missing = series.isna()
+    invalid = parsed.isna() & ~missing
+    values = pd.Series(parsed.dt.to_pydatetime(), index=series.index, dtype=object)
+    values[missing] = default
+    return values, invalid
+
+
+def prepare_rows(df, result):
+    """Validate and normalize the sheet column by column.
+
+    Returns a DataFrame of the rows to insert, in file order, with Ticket column names.
+    Rejected rows are recorded on `result`; duplicate order numbers are only counted.
+    """
+    row_numbers = pd.Series(df.index + 2, index=df.index)
+
+    tanggal, bad_tanggal = parse_tanggal(df['tanggal'], datetime.utcnow())
+    result.reject(row_numbers[bad_tanggal], "Tanggal tidak valid, gunakan format YYYY-MM-DD.")
+
+    tipe = empty_as_none(text_column(df['tipe_pengaduan']))
+    jenis = tipe.map(JENIS_PENGADUAN_CODES)
+    bad_jenis = tipe.notna() & jenis.isna()
+    for row, value in zip(row_numbers[bad_jenis], tipe[bad_jenis]):
+        result.errors.append((row, f"Jenis pengaduan tidak valid: '{value}'"))
+
+    rows = pd.DataFrame({
+        'kanal_pengaduan': text_column(df['kanal_pengaduan']),
+        'tanggal': tanggal,
+        'nama_nasabah': text_column(df['nama_nasabah']),
+        'jenis_pengaduan': jenis.astype(object).where(jenis.notna(), None),
+        'detail_pengaduan': text_column(df['detail_pengaduan']),
+        'order_no': text_column(df['order_no']),
+        'nama_os': blank_missing_names(text_column(df['os']).str.replace(r"[^a-zA-Z]", "", regex=True)),
+        'nama_dc': text_column(df['dc']),
+        'nama_bucket': blank_missing_names(text_column(df['bucket']).str.replace(" ", "", regex=False)),
+        'row_number': row_numbers
+    })
+    rows = rows[~(bad_tanggal | bad_jenis)]
+
+    # Repeats within the file are skipped here; order numbers already stored are checked per chunk.
+    duplicate = (rows['order_no'].fillna('') != '') & rows['order_no'].duplicated()
+    result.duplicates = int(duplicate.sum())
+    return rows[~duplicate]
+
+
+def stored_order_nos(connection, order_nos):
+    """Those of `order_nos` already on a ticket or claimed by another import (indexed IN lookups)."""
+    order_nos = list(order_nos)
+    if not order_nos:
+        return set()
+    found = set(connection.execute(select(ticket.c.order_no).where(ticket.c.order_no.in_(order_nos))).scalars())
+    found.update(connection.execute(select(order_claim.c.order_no).where(order_claim.c.order_no.in_(order_nos))).scalars())
+    return found
+
+
+def move_order_claim(connection, ticket_id, order_no):
+    """Move the claim of an imported ticket to its edited order number; tickets entered by hand
+    hold no claim. Raises IntegrityError if another import has claimed `order_no`."""
+    claimed = connection.execute(order_claim.delete().where(order_claim.c.ticket_id == ticket_id)).rowcount
+    if claimed and order_no:
+        connection.execute(order_claim.insert().values(order_no=order_no, ticket_id=ticket_id))
+
+
+def insert_chunk(connection, rows, user_id):
+    """Insert the rows of one chunk whose order number is not stored yet as new cases, and
+    refresh the rollups the Ticket listeners would have refreshed for ORM inserts.
+
+    Returns (inserted, duplicates). Raises IntegrityError if a concurrent import claimed one
+    of the order numbers first.
+    """
+    stored = stored_order_nos(connection, {row['order_no'] for row in rows if row['order_no']})
+    fresh = [row for row in rows if row['order_no'] not in stored]
+    if not fresh:
+        return 0, len(rows)
+
+    numbers = reserve_ticket_numbers(len(fresh))
+    connection.execute(nomor_ticket.insert(), [{'nomor_ticket': number} for number in numbers])
+    case_ids = dict(connection.execute(
+        select(nomor_ticket.c.nomor_ticket, nomor_ticket.c.id).where(nomor_ticket.c.nomor_ticket.in_(numbers))
+    ).all())
+
+    created_time = datetime.utcnow()
+    tickets = []
+    for number, row in zip(numbers, fresh):
+        values = {key: row[key] for key in row if key != 'row_number'}
+        values.update(
+            nomor_ticket_id=case_ids[number],
+            input_by=user_id,
+            status_ticket='1',
+            created_time=created_time
+        )
+        tickets.append(values)
+    connection.execute(ticket.insert(), tickets)
+
+    # The primary key on order_claim is what keeps two concurrent uploads from both
+    # inserting an order number: the second one waits here, then fails.
+    claims = connection.execute(
+        select(ticket.c.order_no, ticket.c.id)
+        .where(ticket.c.nomor_ticket_id.in_(case_ids.values()), ticket.c.order_no.isnot(None), ticket.c.order_no != '')
+    ).all()
+    if claims:
+        connection.execute(order_claim.insert(), [{'order_no': order_no, 'ticket_id': ticket_id} for order_no, ticket_id in claims])
+
+    refresh_case_summary(connection, case_ids.values())
+    refresh_staff_counters(connection, [user_id])
+    refresh_ticket_daily(connection, [row['tanggal'] for row in fresh])
+    return len(fresh), len(rows) - len(fresh)
+
+
+def import_chunk(chunk, user_id, result):
+    """Insert one chunk in its own transaction and record the outcome on `result`."""
+    for attempt in (1, 2):
+        try:
+            with db.engine.begin() as connection:
+                inserted, duplicates = insert_chunk(connection, chunk, user_id)
+        except IntegrityError as e:
+            if attempt == 1:
+                # Another upload committed some of these order numbers meanwhile; check again.
+                continue
+            result.reject([row['row_number'] for row in chunk], f"Gagal disimpan: {e}")
+        except Exception as e:
+            result.reject([row['row_number'] for row in chunk], f"Gagal disimpan: {e}")
+        else:
+            result.inserted += inserted
+            result.duplicates += duplicates
+        return
+
+
+def import_tickets(df, user_id, chunk_size=CHUNK_SIZE, progress=None):
+    """Import the rows of an uploaded sheet as new cases for `user_id`. Returns an ImportResult.
+
+    Rows are validated up front, then inserted with core bulk inserts in chunks of
+    `chunk_size`, each chunk in its own short transaction with its case numbers reserved in
+    one block. Order numbers are checked against the database only for the rows of the chunk.
+    A chunk that fails to insert is rolled back and reported against its rows; the chunks
+    before it stay imported.
+
+    `progress(processed, total, summary)`, if given, is called after validation and after
+    each chunk.
+    """
+    result = ImportResult(len(df))
+    rows = prepare_rows(df, result).to_dict('records')
+
+    def report():
+        if progress is not None:
+            progress(result.processed, result.parsed, result.summary())
+
+    report()
+
+    try:
+        for start in range(0, len(rows), chunk_size):
+            import_chunk(rows[start:start + chunk_size], user_id, result)
+            report()
+    finally:
+        # Core inserts bypass the session, so the after_commit invalidation never sees them.
+        if result.inserted:
+            sla_warnings.invalidate()
+            result_cache.invalidate()
+
+    result.errors.sort()
+    return result
+
+
+def check_columns(columns):
+    if not all(col in columns for col in IMPORT_COLUMNS):
+        raise SheetError("Kolom Excel tidak sesuai template.")
+
+
+def check_sheet(source):
+    """Read only the header row of an uploaded workbook and raise SheetError if it is not the template."""
+    check_columns(pd.read_excel(source, nrows=0).columns)
+
+
+def read_sheet(source):
+    df = pd.read_excel(source)
+    check_columns(df.columns)
+    return df
+
+
+def import_file(source, user_id, progress=None):
+    """Read an uploaded workbook (path or file object) and import it; see import_tickets."""
+    return import_tickets(read_sheet(source), user_id, progress=progress)
+
+
+def write_error_report(result, path):
+    """Write the rejected rows of `result` as CSV to `path` and return the path."""
+    partial = path + '.part'
+    with open(partial, 'w', newline='', encoding='utf-8-sig') as output:
+        writer = csv.writer(output)
+        writer.writerow(["Baris", "Keterangan"])
+        writer.writerows(result.errors)
+    os.replace(partial, path)
+    return path
@@ -0,0 +1,163 @@
+import os
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from extensions import db
+from models import BackgroundJob, JobRun, local_now
+
+job_table = BackgroundJob.__table__
+job_run_table = JobRun.__table__
+
+WORKERS = 2
+RETENTION_HOURS = 24
+
+
+class JobRunner:
+    """Runs long tasks (exports, imports) on a small local thread pool.
+
+    Job state lives in the background_job table, so any worker process can report progress,
+    and finished files are written under JOB_FOLDER so any process on the host can serve them.
+    A job only runs in the process that accepted it; jobs still queued or running when that
+    process exits stay unfinished and are removed with the other expired jobs.
+
+    Configured by JOB_FOLDER, JOB_WORKERS and JOB_RETENTION_HOURS.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.folder = None
+        self.retention = timedelta(hours=RETENTION_HOURS)
+        self._executor = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.folder = app.config.get('JOB_FOLDER') or os.path.join(app.instance_path, 'jobs')
+        self.retention = timedelta(hours=app.config.get('JOB_RETENTION_HOURS', RETENTION_HOURS))
+        os.makedirs(self.folder, exist_ok=True)
+        self._executor = ThreadPoolExecutor(
+            max_workers=app.config.get('JOB_WORKERS', WORKERS),
+            thread_name_prefix='background-job'
+        )
+
+    def path_for(self, job_id, extension):
+        return os.path.join(self.folder, f"{job_id}.{extension}")
+
+    def new_id(self):
+        return uuid.uuid4().hex
+
+    def submit(self, kind, func, params=None, created_by=None, file_name=None, job_id=None):
+        """Record a queued job and run `func(job_id, progress)` on the pool. Returns the job id.
+
+        `func` returns the path of the file it produced, or None. `progress(processed, total=None,
+        summary=None)` may be called as often as once per chunk; `summary` is a dict of counts
+        shown with the job. Pass `job_id` (from new_id()) when files must be named before submitting.
+        """
+        job = BackgroundJob(
+            id=job_id or self.new_id(),
+            kind=kind,
+            status='queued',
+            params=params,
+            created_by=created_by,
+            file_name=file_name,
+            expires_at=local_now() + self.retention
+        )
+        db.session.add(job)
+        db.session.commit()
+        self._executor.submit(self._run, job.id, func)
+        return job.id
+
+    def _update(self, job_id, **values):
+        # Own short transaction, so progress is visible to status requests right away.
+        with db.engine.begin() as connection:
+            connection.execute(job_table.update().where(job_table.c.id == job_id).values(**values))
+
+    def _run(self, job_id, func):
+        with self.app.app_context():
+            self._update(job_id, status='running')
+
+            def progress(processed, total=None, summary=None):
+                values = {'processed': processed}
+                if total is not None:
+                    values['total'] = total
+                if summary is not None:
+                    values['summary'] = summary
+                self._update(job_id, **values)
+
+            try:
+                path = func(job_id, progress)
+            except Exception:
+                traceback.print_exc()
+                self._update(
+                    job_id,
+                    status='failed',
+                    error=traceback.format_exc(limit=3),
+                    finished_at=local_now()
+                )
+            else:
+                self._update(
+                    job_id,
+                    status='done',
+                    file_path=path,
+                    finished_at=local_now(),
+                    expires_at=local_now() + self.retention
+                )
+            finally:
+                db.session.remove()
+
+    def expire(self):
+        """Delete expired jobs and their files, plus files no job refers to any more. Returns the count."""
+        now = local_now()
+        expired = db.session.query(BackgroundJob.id, BackgroundJob.file_path)\
+            .filter(BackgroundJob.expires_at < now).all()
+        for _, path in expired:
+            if path and os.path.exists(path):
+                os.remove(path)
+        if expired:
+            db.session.query(BackgroundJob)\
+                .filter(BackgroundJob.id.in_([job_id for job_id, _ in expired]))\
+                .delete(synchronize_session=False)
+            db.session.commit()
+
+        known = {job_id for (job_id,) in db.session.query(BackgroundJob.id)}
+        cutoff = (datetime.now() - self.retention).timestamp()
+        for name in os.listdir(self.folder):
+            path = os.path.join(self.folder, name)
+            job_id = name.split('.', 1)[0]
+            if job_id not in known and os.path.getmtime(path) < cutoff:
+                os.remove(path)
+        return len(expired)
+
+
+job_runner = JobRunner()
+
+
+@contextmanager
+def recorded_run(name):
+    """Record one run of a scheduled job in job_run: when it ran, how long it took, the rows it
+    touched and, if it raised, the error. The job sets run['rows'] as it goes."""
+    run = {'rows': 0}
+    started_at = local_now()
+    start = time.monotonic()
+    status, error = 'done', None
+    try:
+        yield run
+    except Exception:
+        status, error = 'failed', traceback.format_exc(limit=3)
+        raise
+    finally:
+        with db.engine.begin() as connection:
+            connection.execute(job_run_table.insert().values(
+                name=name,
+                status=status,
+                started_at=started_at,
+                finished_at=local_now(),
+                duration_seconds=round(time.monotonic() - start, 3),
+                rows_touched=run['rows'],
+                error=error
+            ))
@@ -1,11 +1,52 @@
 from flask_login import UserMixin
 from extensions import db
-from datetime import datetime
+from sqlalchemy.orm import validates
+from datetime import datetime, timedelta
 from zoneinfo import ZoneInfo
 from pytz import timezone
 
 JAKARTA_TZ = ZoneInfo("Asia/Jakarta")
 
+SLA_DAYS = 10
+
+
+def local_now():
+    return datetime.now(JAKARTA_TZ).replace(tzinfo=None)
+
+
+def local_today():
+    """Midnight of the current day in Jakarta, as a naive datetime."""
+    return local_now().replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+# What nama_os / nama_bucket held for "unknown" before they were normalized to ''.
+MISSING_NAMES = ('', '-', 'None')
+
+
+def blank_if_missing(value):
+    # NaN (a spreadsheet's empty cell) is the only value not equal to itself.
+    if value is None or value != value:
+        return ''
+    value = str(value)
+    if value.strip() in MISSING_NAMES:
+        return ''
+    return value
+
+
+def sla_deadline(days=SLA_DAYS):
+    """When an SLA of `days` starting today runs out: one day is used up at the Jakarta midnight
+    ending each working day (see sla_calendar)."""
+    from sla_calendar import sla_calendar
+    return sla_calendar.deadline(days)
+
+
+def remaining_sla(due_at, days=None):
+    """SLA days left before `due_at`, or the stored `days` of a ticket that has no deadline."""
+    if due_at is None:
+        return days
+    from sla_calendar import sla_calendar
+    return sla_calendar.remaining(due_at)
+
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(150), nullable=False, unique=True)
@@ -15,6 +56,14 @@ class User(UserMixin, db.Model):
     role = db.Column(db.String(10))
 
 class Ticket(db.Model):
+    __table_args__ = (
+        db.Index('ix_ticket_created_time_id', 'created_time', 'id'),
+        db.Index('ix_ticket_tanggal_id', 'tanggal', 'id'),
+        db.Index('ix_ticket_order_no', 'order_no'),
+        db.Index('ix_ticket_sla_due_at', 'sla_due_at'),
+        db.Index('ix_ticket_sla', 'sla'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     kanal_pengaduan = db.Column(db.String(100), nullable=True)
     kategori_pengaduan = db.Column(db.String(100), nullable=True)
@@ -34,14 +83,17 @@ class Ticket(db.Model):
     user = db.relationship('User', backref=db.backref('tickets', lazy=True))
     
     status_ticket = db.Column(db.String(50), default='1', nullable=True)
-    sla = db.Column(db.Integer, default=10, nullable=True)
+    # The SLA runs out at sla_due_at. Closed tickets (status 4) have no deadline and keep the
+    # days they had left in the old `sla` column, until they are reopened.
+    sla_due_at = db.Column(db.DateTime, default=sla_deadline, nullable=True)
+    sla_days = db.Column('sla', db.Integer, nullable=True)
     hasil_tindak = db.Column(db.Text, nullable=True)
     hasil_feedback = db.Column(db.Text, nullable=True)
     konfirmasi_nasabah = db.Column(db.Text(100), nullable=True)  
     notes = db.Column(db.Text, nullable=True)
     nama_dc = db.Column(db.String(100), nullable=True)
-    nama_os = db.Column(db.String(100), nullable=True)
-    nama_bucket = db.Column(db.String(100), nullable=True)
+    nama_os = db.Column(db.String(100), default='', nullable=True)
+    nama_bucket = db.Column(db.String(100), default='', nullable=True)
     punishment = db.Column(db.Text, nullable=True)
     hasil_punishment = db.Column(db.Text, nullable=True)
     bukti_chat = db.Column(db.String(300), nullable=True) 
@@ -60,10 +112,23 @@ class Ticket(db.Model):
     nomor_ticket_id = db.Column(db.Integer, db.ForeignKey('nomor_ticket.id'), nullable=True)
     nomor_ticket = db.relationship('NomorTicket', back_populates='tickets')
 
+    @validates('nama_os', 'nama_bucket')
+    def normalize_names(self, key, value):
+        return blank_if_missing(value)
+
+    @property
+    def sla(self):
+        """SLA days left, as the templates show it."""
+        return remaining_sla(self.sla_due_at, self.sla_days)
+
     def __repr__(self):
         return f"<Ticket {self.id}>"
     
 class NomorTicket(db.Model):
+    __table_args__ = (
+        db.Index('ix_nomor_ticket_change_date', 'change_date'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     nomor_ticket = db.Column(db.String(100), unique=True, nullable=False)
     status = db.Column(db.String(20), default='aktif')
@@ -80,6 +145,131 @@ class NomorTicket(db.Model):
     def __repr__(self):
         return f"<NomorTicket {self.nomor_ticket}>"
 
+class TicketSequence(db.Model):
+    __tablename__ = 'ticket_sequence'
+
+    prefix = db.Column(db.String(20), primary_key=True)
+    last_number = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=lambda: datetime.now(JAKARTA_TZ))
+
+    def __repr__(self):
+        return f"<TicketSequence {self.prefix} {self.last_number}>"
+
+class OrderClaim(db.Model):
+    """One row per order number brought in by an Excel import, so two concurrent uploads
+    cannot both insert it. Goes away with its ticket."""
+    __tablename__ = 'order_claim'
+
+    order_no = db.Column(db.String(100), primary_key=True)
+    ticket_id = db.Column(db.Integer, db.ForeignKey('ticket.id', ondelete='CASCADE'), nullable=False, index=True)
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(JAKARTA_TZ))
+
+    def __repr__(self):
+        return f"<OrderClaim {self.order_no}>"
+
+class SlaCalendarDay(db.Model):
+    __tablename__ = 'sla_calendar'
+
+    day = db.Column(db.Date, primary_key=True)
+    is_workday = db.Column(db.Boolean, nullable=False)
+    workday_index = db.Column(db.Integer, nullable=False, index=True)
+    holiday = db.Column(db.String(150), nullable=True)
+
+    def __repr__(self):
+        return f"<SlaCalendarDay {self.day} {self.workday_index}>"
+
+class CaseSummary(db.Model):
+    __tablename__ = 'case_summary'
+
+    nomor_ticket_id = db.Column(db.Integer, db.ForeignKey('nomor_ticket.id'), primary_key=True)
+    first_ticket_id = db.Column(db.Integer, db.ForeignKey('ticket.id'), nullable=True, index=True)
+    first_created_time = db.Column(db.DateTime, nullable=True, index=True)
+    order_count = db.Column(db.Integer, nullable=False, default=0)
+    min_sla_due_at = db.Column(db.DateTime, nullable=True, index=True)
+    has_feedback_qc = db.Column(db.Boolean, nullable=False, default=False)
+    input_by = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True, index=True)
+    updated_at = db.Column(db.DateTime, default=lambda: datetime.now(JAKARTA_TZ))
+
+    nomor_ticket = db.relationship('NomorTicket', backref=db.backref('summary', uselist=False))
+
+    def __repr__(self):
+        return f"<CaseSummary {self.nomor_ticket_id}>"
+
+class StaffCounter(db.Model):
+    __tablename__ = 'staff_counter'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    total_ticket = db.Column(db.Integer, nullable=False, default=0)
+    open_ticket = db.Column(db.Integer, nullable=False, default=0)
+    in_progress = db.Column(db.Integer, nullable=False, default=0)
+    pending = db.Column(db.Integer, nullable=False, default=0)
+    closed = db.Column(db.Integer, nullable=False, default=0)
+    resolved = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=lambda: datetime.now(JAKARTA_TZ))
+
+    def __repr__(self):
+        return f"<StaffCounter {self.user_id}>"
+
+class TicketDaily(db.Model):
+    __tablename__ = 'ticket_daily'
+    __table_args__ = (
+        db.Index('ix_ticket_daily_tanggal_os', 'tanggal', 'nama_os'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    tanggal = db.Column(db.Date, nullable=True)
+    nama_os = db.Column(db.String(100), nullable=True)
+    nama_bucket = db.Column(db.String(100), nullable=True)
+    kanal_pengaduan = db.Column(db.String(100), nullable=True)
+    jenis_pengaduan = db.Column(db.String(100), nullable=True)
+    status_ticket = db.Column(db.String(50), nullable=True)
+    ticket_count = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=lambda: datetime.now(JAKARTA_TZ))
+
+    def __repr__(self):
+        return f"<TicketDaily {self.tanggal} {self.nama_os}>"
+
+class BackgroundJob(db.Model):
+    __tablename__ = 'background_job'
+
+    id = db.Column(db.String(32), primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='queued')
+    params = db.Column(db.JSON, nullable=True)
+    total = db.Column(db.Integer, nullable=True)
+    processed = db.Column(db.Integer, nullable=False, default=0)
+    summary = db.Column(db.JSON, nullable=True)
+    file_name = db.Column(db.String(255), nullable=True)
+    file_path = db.Column(db.String(500), nullable=True)
+    error = db.Column(db.Text, nullable=True)
+    created_by = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(JAKARTA_TZ))
+    finished_at = db.Column(db.DateTime, nullable=True)
+    expires_at = db.Column(db.DateTime, nullable=True, index=True)
+
+    user = db.relationship('User', backref=db.backref('background_jobs', lazy=True))
+
+    def __repr__(self):
+        return f"<BackgroundJob {self.kind} {self.id} {self.status}>"
+
+class JobRun(db.Model):
+    __tablename__ = 'job_run'
+    __table_args__ = (
+        db.Index('ix_job_run_name_started_at', 'name', 'started_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    status = db.Column(db.String(20), nullable=False)
+    started_at = db.Column(db.DateTime, nullable=False)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    duration_seconds = db.Column(db.Float, nullable=True)
+    rows_touched = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.Text, nullable=True)
+
+    def __repr__(self):
+        return f"<JobRun {self.name} {self.started_at} {self.status}>"
+
 class Kontak(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     nama_lengkap = db.Column(db.String(150), nullable=False)
@@ -95,6 +285,10 @@ class Kontak(db.Model):
         return f"<Kontak {self.nama_lengkap}>"
 
 class History(db.Model):
+    __table_args__ = (
+        db.Index('ix_history_tanggal_id', 'tanggal', 'id'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     nomor_ticket = db.Column(db.String(100), nullable=False)  
     tanggal = db.Column(db.DateTime, default=lambda: datetime.now(timezone('Asia/Jakarta')), nullable=False)
@@ -0,0 +1,212 @@
+from datetime import datetime, timedelta
+
+from flask import current_app, g
+from sqlalchemy import func, or_, case
+from sqlalchemy.orm import contains_eager
+
+from cursors import decode_cursor, before, keyset_paginate
+from extensions import db
+from models import Ticket, NomorTicket, CaseSummary
+
+NEWEST_FIRST = (Ticket.created_time.desc(), Ticket.id.desc())
+
+ESKALASI_QC_FIRST = (
+    case((Ticket.tahapan == 'Eskalasi ke QC', 0), else_=1),
+    Ticket.created_time.desc(),
+    Ticket.id.desc()
+)
+
+REOPEN_LABEL_FIRST = (
+    case((NomorTicket.label_case == 'reopen', 0), else_=1),
+    NomorTicket.change_date.desc(),
+    Ticket.id.desc()
+)
+
+
+def on_date(column, value):
+    """Filter `column` to a single calendar day given as YYYY-MM-DD.
+
+    Uses a half-open range instead of DATE(column) so the column index can be used.
+    Invalid dates are ignored, as the list views always did.
+    """
+    if not value:
+        return []
+    try:
+        day = datetime.strptime(value, "%Y-%m-%d")
+    except ValueError:
+        return []
+    return [column >= day, column < day + timedelta(days=1)]
+
+
+def ticket_filters(jenis=None, status=None, tanggal=None, tahapan=None):
+    filters = []
+    if jenis:
+        filters.append(Ticket.jenis_pengaduan == jenis)
+    if status:
+        filters.append(Ticket.status_ticket == status)
+    filters += on_date(Ticket.tanggal, tanggal)
+    if tahapan:
+        filters.append(Ticket.tahapan == tahapan)
+    return filters
+
+
+def use_case_summary():
+    return current_app.config.get('USE_CASE_SUMMARY', False)
+
+
+def search_filter(q):
+    """Match cases by nomor ticket or by the nama nasabah of any of their tickets."""
+    pattern = f"%{q}%"
+    return or_(
+        NomorTicket.nomor_ticket.ilike(pattern),
+        NomorTicket.tickets.any(Ticket.nama_nasabah.ilike(pattern))
+    )
+
+
+class TicketQueue:
+    """The earliest matching ticket of every case, in one query.
+
+    `case_filters` select which NomorTicket rows belong to the queue. Conditions on
+    the tickets of a case ("has a ticket with status 1") must be written with
+    `NomorTicket.tickets.any(...)` so they do not restrict which ticket is picked.
+    `ticket_filters` restrict the tickets a case's first ticket is chosen from.
+
+    Without ticket filters the first ticket is read from case_summary when
+    USE_CASE_SUMMARY is on, skipping the window over the ticket table.
+    """
+
+    def __init__(self, case_filters, ticket_filters=(), order_by=NEWEST_FIRST):
+        self.case_filters = list(case_filters)
+        self.ticket_filters = list(ticket_filters)
+        self.order_by = order_by
+
+    def _matching(self, *columns):
+        return db.session.query(*columns)\
+            .join(NomorTicket, NomorTicket.id == Ticket.nomor_ticket_id)\
+            .filter(*self.case_filters, *self.ticket_filters)
+
+    def _from_summary(self):
+        return not self.ticket_filters and use_case_summary()
+
+    def _first_tickets(self):
+        if self._from_summary():
+            return Ticket.query\
+                .join(CaseSummary, CaseSummary.first_ticket_id == Ticket.id)\
+                .join(NomorTicket, NomorTicket.id == CaseSummary.nomor_ticket_id)\
+                .options(contains_eager(Ticket.nomor_ticket))\
+                .filter(*self.case_filters)
+
+        ranked = self._matching(
+            Ticket.id.label('id'),
+            func.row_number().over(
+                partition_by=Ticket.nomor_ticket_id,
+                order_by=(Ticket.created_time.asc(), Ticket.id.asc())
+            ).label('rn')
+        ).subquery()
+
+        return Ticket.query\
+            .join(ranked, ranked.c.id == Ticket.id)\
+            .join(NomorTicket, NomorTicket.id == Ticket.nomor_ticket_id)\
+            .options(contains_eager(Ticket.nomor_ticket))\
+            .filter(ranked.c.rn == 1)
+
+    def query(self):
+        return self._first_tickets().order_by(*self.order_by)
+
+    def all(self):
+        return self.query().all()
+
+    def count(self):
+        if self._from_summary():
+            return db.session.query(func.count(CaseSummary.nomor_ticket_id))\
+                .join(NomorTicket, NomorTicket.id == CaseSummary.nomor_ticket_id)\
+                .filter(*self.case_filters).scalar() or 0
+        return self._matching(func.count(func.distinct(Ticket.nomor_ticket_id))).scalar() or 0
+
+    def paginate(self, page=1, per_page=10):
+        page = max(page or 1, 1)
+        items = self.query().limit(per_page).offset((page - 1) * per_page).all()
+        return QueuePage(items, page, per_page, self.count())
+
+    def cursor_page(self, cursor=None, per_page=10):
+        """Keyset page of a newest-first queue, see cursors.keyset_paginate."""
+        if self.order_by is not NEWEST_FIRST:
+            raise ValueError("cursor pages are only available for newest-first queues")
+
+        queue = self
+        decoded = decode_cursor(cursor)
+        if decoded and decoded[0] == 'next':
+            # A case's first ticket is its earliest, so dropping the tickets at or past the
+            # cursor before ranking keeps every remaining case's first ticket unchanged.
+            queue = TicketQueue(
+                self.case_filters,
+                self.ticket_filters + [before(Ticket.created_time, Ticket.id, decoded[1], decoded[2])]
+            )
+        return keyset_paginate(queue._first_tickets(), Ticket.created_time, Ticket.id, cursor, per_page)
+
+
+class QueuePage:
+    """One page of a queue, shaped like Flask-SQLAlchemy's Pagination for the templates."""
+
+    def __init__(self, items, page, per_page, total):
+        self.items = items
+        self.page = page
+        self.per_page = per_page
+        self.total = total
+        self.pages = (total + per_page - 1) // per_page
+        self.has_prev = page > 1
+        self.has_next = page < self.pages
+        self.prev_num = page - 1
+        self.next_num = page + 1
+
+
+def order_counts(tickets, *filters):
+    """Number of tickets per case, for the cases of `tickets` only.
+
+    Plain counts come from case_summary when USE_CASE_SUMMARY is on and are memoised
+    for the rest of the request; `filters` count only the matching tickets instead.
+    """
+    case_ids = {t.nomor_ticket_id for t in tickets if t.nomor_ticket_id is not None}
+    if not case_ids:
+        return {}
+
+    if filters or not use_case_summary():
+        rows = db.session.query(Ticket.nomor_ticket_id, func.count(Ticket.id))\
+            .filter(Ticket.nomor_ticket_id.in_(case_ids), *filters)\
+            .group_by(Ticket.nomor_ticket_id).all()
+        return dict(rows)
+
+    memo = g.setdefault('order_counts', {})
+    missing = case_ids - memo.keys()
+    if missing:
+        rows = db.session.query(CaseSummary.nomor_ticket_id, CaseSummary.order_count)\
+            .filter(CaseSummary.nomor_ticket_id.in_(missing)).all()
+        memo.update(rows)
+    return {i: memo[i] for i in case_ids if i in memo}
+
+
+def annotate_feedback_qc(tickets):
+    """Set the feedback QC badge on each ticket with a single lookup for all their cases."""
+    case_ids = {t.nomor_ticket_id for t in tickets}
+    with_feedback = set()
+    if case_ids and use_case_summary():
+        rows = db.session.query(CaseSummary.nomor_ticket_id).filter(
+            CaseSummary.nomor_ticket_id.in_(case_ids),
+            CaseSummary.has_feedback_qc.is_(True)
+        ).all()
+        with_feedback = {row[0] for row in rows}
+    elif case_ids:
+        rows = db.session.query(Ticket.nomor_ticket_id).filter(
+            Ticket.nomor_ticket_id.in_(case_ids),
+            or_(
+                Ticket.deskripsi_qc.isnot(None),
+                Ticket.file_qc.isnot(None)
+            )
+        ).distinct().all()
+        with_feedback = {row[0] for row in rows}
+
+    for ticket in tickets:
+        ada_feedback_qc = ticket.nomor_ticket_id in with_feedback
+        ticket.feedback_qc_status = "Check Feedback QC" if ada_feedback_qc else "Belum ada Feedback QC"
+        ticket.feedback_qc_badge = "success" if ada_feedback_qc else "warning"
+    return tickets
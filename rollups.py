@@ -0,0 +1,139 @@
+from datetime import datetime
+
+from sqlalchemy import select, func, case, or_, distinct
+
+from models import Ticket, NomorTicket, CaseSummary, StaffCounter, JAKARTA_TZ
+
+CHUNK_SIZE = 500
+
+ticket = Ticket.__table__
+case_summary = CaseSummary.__table__
+staff_counter = StaffCounter.__table__
+
+STAFF_STATUS_COUNTERS = {
+    'open_ticket': '1',
+    'in_progress': '2',
+    'pending': '3',
+    'closed': '4',
+    'resolved': '5',
+}
+
+
+def _chunks(ids, size=CHUNK_SIZE):
+    ids = sorted(ids)
+    for i in range(0, len(ids), size):
+        yield ids[i:i + size]
+
+
+def _summary_rows(connection, nomor_ticket_ids):
+    ranked = select(
+        ticket.c.nomor_ticket_id,
+        ticket.c.id,
+        ticket.c.created_time,
+        ticket.c.input_by,
+        func.row_number().over(
+            partition_by=ticket.c.nomor_ticket_id,
+            order_by=(ticket.c.created_time.asc(), ticket.c.id.asc())
+        ).label('rn')
+    ).where(ticket.c.nomor_ticket_id.in_(nomor_ticket_ids)).subquery()
+
+    totals = select(
+        ticket.c.nomor_ticket_id,
+        func.count(ticket.c.id).label('order_count'),
+        func.min(ticket.c.sla_due_at).label('min_sla_due_at'),
+        func.max(case(
+            (or_(ticket.c.deskripsi_qc.isnot(None), ticket.c.file_qc.isnot(None)), 1),
+            else_=0
+        )).label('has_feedback_qc')
+    ).where(ticket.c.nomor_ticket_id.in_(nomor_ticket_ids))\
+        .group_by(ticket.c.nomor_ticket_id).subquery()
+
+    rows = connection.execute(
+        select(
+            totals.c.nomor_ticket_id,
+            ranked.c.id,
+            ranked.c.created_time,
+            ranked.c.input_by,
+            totals.c.order_count,
+            totals.c.min_sla_due_at,
+            totals.c.has_feedback_qc
+        ).join(ranked, (ranked.c.nomor_ticket_id == totals.c.nomor_ticket_id) & (ranked.c.rn == 1))
+    ).all()
+
+    now = datetime.now(JAKARTA_TZ)
+    return [
+        {
+            'nomor_ticket_id': row[0],
+            'first_ticket_id': row[1],
+            'first_created_time': row[2],
+            'input_by': row[3],
+            'order_count': row[4],
+            'min_sla_due_at': row[5],
+            'has_feedback_qc': bool(row[6]),
+            'updated_at': now,
+        }
+        for row in rows
+    ]
+
+
+def refresh_case_summary(connection, nomor_ticket_ids):
+    """Recompute the case_summary rows of the given cases on `connection`.
+
+    Runs on the flush connection from the Ticket listeners, so the summary commits or
+    rolls back together with the ticket change. Cases without tickets lose their row.
+    """
+    ids = {i for i in nomor_ticket_ids if i is not None}
+    for chunk in _chunks(ids):
+        rows = _summary_rows(connection, chunk)
+        connection.execute(case_summary.delete().where(case_summary.c.nomor_ticket_id.in_(chunk)))
+        if rows:
+            connection.execute(case_summary.insert(), rows)
+
+
+def rebuild_case_summary(connection):
+    """Drop and recompute every case_summary row. Returns the number of rows written."""
+    connection.execute(case_summary.delete())
+    ids = [row[0] for row in connection.execute(select(NomorTicket.__table__.c.id))]
+    for chunk in _chunks(ids):
+        refresh_case_summary(connection, chunk)
+    return connection.execute(select(func.count()).select_from(case_summary)).scalar()
+
+
+def staff_counts(connection, user_ids):
+    """Distinct cases per staff member, overall and per status_ticket, in one grouped scan."""
+    case_id = ticket.c.nomor_ticket_id
+    columns = [func.count(distinct(case_id)).label('total_ticket')]
+    for name, status in STAFF_STATUS_COUNTERS.items():
+        columns.append(func.count(distinct(case((ticket.c.status_ticket == status, case_id)))).label(name))
+
+    rows = connection.execute(
+        select(ticket.c.input_by, *columns)
+        .where(ticket.c.input_by.in_(user_ids), case_id.isnot(None))
+        .group_by(ticket.c.input_by)
+    ).mappings().all()
+
+    counts = {user_id: {'total_ticket': 0, **{name: 0 for name in STAFF_STATUS_COUNTERS}} for user_id in user_ids}
+    for row in rows:
+        counts[row['input_by']] = {key: row[key] for key in counts[row['input_by']]}
+    return counts
+
+
+def refresh_staff_counters(connection, user_ids):
+    """Recompute the staff_counter rows of the given users on `connection`."""
+    ids = {i for i in user_ids if i is not None}
+    now = datetime.now(JAKARTA_TZ)
+    for chunk in _chunks(ids):
+        counts = staff_counts(connection, chunk)
+        connection.execute(staff_counter.delete().where(staff_counter.c.user_id.in_(chunk)))
+        connection.execute(
+            staff_counter.insert(),
+            [{'user_id': user_id, 'updated_at': now, **values} for user_id, values in counts.items()]
+        )
+
+
+def rebuild_staff_counters(connection):
+    """Drop and recompute every staff_counter row. Returns the number of rows written."""
+    connection.execute(staff_counter.delete())
+    ids = [row[0] for row in connection.execute(select(ticket.c.input_by).where(ticket.c.input_by.isnot(None)).distinct())]
+    refresh_staff_counters(connection, ids)
+    return len(ids)
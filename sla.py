@@ -0,0 +1,84 @@
+from sqlalchemy import select, func, or_, and_
+
+from extensions import db
+from models import Ticket, local_now, remaining_sla
+from sla_calendar import sla_calendar
+
+BATCH_SIZE = 5000
+
+ticket = Ticket.__table__
+
+
+def sla_left():
+    """Tickets with SLA days left (what used to be `Ticket.sla != 0`), as two indexed predicates."""
+    return or_(Ticket.sla_due_at > local_now(), Ticket.sla_days > 0)
+
+
+def sla_expired():
+    """Tickets whose SLA ran out (what used to be `Ticket.sla == 0`)."""
+    return or_(Ticket.sla_due_at <= local_now(), Ticket.sla_days == 0)
+
+
+def sla_within(low, high):
+    """Tickets with between `low` and `high` SLA days left (low >= 1)."""
+    return or_(
+        and_(Ticket.sla_due_at > sla_calendar.deadline(low - 1), Ticket.sla_due_at <= sla_calendar.deadline(high)),
+        Ticket.sla_days.between(low, high)
+    )
+
+
+def pause_sla(target):
+    """Closing a ticket stops its SLA: the days left are kept and the deadline dropped."""
+    if target.sla_due_at is not None:
+        target.sla_days = remaining_sla(target.sla_due_at)
+        target.sla_due_at = None
+
+
+def resume_sla(target):
+    """Reopening a closed ticket sets a new deadline from the days it had left."""
+    if target.sla_due_at is None and target.sla_days is not None:
+        target.sla_due_at = sla_calendar.deadline(target.sla_days)
+        target.sla_days = None
+
+
+def sla_after_transition(old_status, new_status, due_at, days):
+    """(sla_due_at, sla) of a ticket moving from `old_status` to `new_status`: what pause_sla and
+    resume_sla leave on it, for status changes written without the ORM."""
+    if new_status == '4' and old_status != '4' and due_at is not None:
+        return None, remaining_sla(due_at)
+    if old_status == '4' and new_status != '4' and due_at is None and days is not None:
+        return sla_calendar.deadline(days), None
+    return due_at, days
+
+
+def backfill_sla_due_at(batch_size=BATCH_SIZE):
+    """Turn the day counters of tickets that are not closed into deadlines. Returns the rows updated.
+
+    One UPDATE per remaining-days value within each range of `batch_size` ticket ids, one
+    transaction per range. Tickets already on a deadline are left alone, so it can be re-run.
+    """
+    with db.engine.connect() as connection:
+        low, high = connection.execute(select(func.min(ticket.c.id), func.max(ticket.c.id))).one()
+        values = list(connection.execute(
+            select(ticket.c.sla).where(ticket.c.sla.isnot(None), ticket.c.sla_due_at.is_(None)).distinct()
+        ).scalars())
+    if low is None:
+        return 0
+
+    deadlines = {days: sla_calendar.deadline(days) for days in values}
+    updated = 0
+    for start in range(low, high + 1, batch_size):
+        with db.engine.begin() as connection:
+            for days in values:
+                updated += connection.execute(
+                    ticket.update()
+                    .where(
+                        ticket.c.id >= start,
+                        ticket.c.id < start + batch_size,
+                        ticket.c.sla == days,
+                        ticket.c.sla_due_at.is_(None),
+                        or_(ticket.c.status_ticket != '4', ticket.c.status_ticket.is_(None))
+                    )
+                    .values(sla_due_at=deadlines[days], sla=None)
+                ).rowcount
+    return updated
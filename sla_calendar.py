@@ -0,0 +1,151 @@
+import os
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import select
+
+from extensions import db
+from models import SlaCalendarDay, local_today
+
+calendar_table = SlaCalendarDay.__table__
+
+TTL_SECONDS = 3600
+HOLIDAYS_FILE = 'holidays.txt'
+
+
+def read_holidays(path):
+    """{date: name} from a file of `YYYY-MM-DD name` lines; blank lines and # comments are skipped."""
+    holidays = {}
+    with open(path, encoding='utf-8') as f:
+        for number, line in enumerate(f, 1):
+            line = line.split('#', 1)[0].strip()
+            if not line:
+                continue
+            day, _, name = line.partition(' ')
+            try:
+                holidays[date.fromisoformat(day)] = name.strip() or None
+            except ValueError:
+                raise ValueError(f"{path}:{number}: invalid date {day!r}")
+    return holidays
+
+
+def calendar_rows(first, last, holidays):
+    """One row per day in [first, last]: Saturdays, Sundays and holidays are not working days.
+
+    workday_index counts the working days from `first` up to and including the day, so the
+    working days between two dates are a difference of two indexes.
+    """
+    rows = []
+    index = 0
+    day = first
+    while day <= last:
+        is_workday = day.weekday() < 5 and day not in holidays
+        index += is_workday
+        rows.append({'day': day, 'is_workday': is_workday, 'workday_index': index, 'holiday': holidays.get(day)})
+        day += timedelta(days=1)
+    return rows
+
+
+def years_without_holidays(first, last, holidays):
+    """Years of [first, last] with no holiday listed: their holidays would count as working days."""
+    return [year for year in range(first.year, last.year + 1) if not any(day.year == year for day in holidays)]
+
+
+def build_calendar(connection, first, last, holidays):
+    """Replace the sla_calendar table with the days of [first, last]. Returns the number of days."""
+    rows = calendar_rows(first, last, holidays)
+    connection.execute(calendar_table.delete())
+    connection.execute(calendar_table.insert(), rows)
+    return len(rows)
+
+
+class SlaCalendar:
+    """Business-day SLA deadlines from the precomputed sla_calendar table.
+
+    The table is read once into memory (a few thousand rows) and reloaded after `ttl`
+    seconds or on invalidate(), so deadlines and days left are dictionary lookups. Outside
+    the calendar's range, or when USE_SLA_CALENDAR is off or the table is empty, SLAs count
+    calendar days as before.
+
+    Deadlines are a midnight: the one ending the last working day of the SLA. The list
+    filters therefore stay plain comparisons on Ticket.sla_due_at.
+
+    Configured by USE_SLA_CALENDAR and SLA_HOLIDAYS_FILE.
+    """
+
+    def __init__(self, app=None, ttl=TTL_SECONDS):
+        self.ttl = ttl
+        self.enabled = False
+        self.holidays_file = None
+        self._lock = threading.Lock()
+        self._loaded = None
+        self._expires_at = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = app.config.get('USE_SLA_CALENDAR', False)
+        self.holidays_file = app.config.get('SLA_HOLIDAYS_FILE') or os.path.join(app.root_path, HOLIDAYS_FILE)
+
+    def _load(self):
+        rows = db.session.execute(
+            select(calendar_table.c.day, calendar_table.c.is_workday, calendar_table.c.workday_index)
+            .order_by(calendar_table.c.day)
+        ).all()
+        if not rows:
+            return None
+        index = {day: workday_index for day, _, workday_index in rows}
+        workdays = [day for day, is_workday, _ in rows if is_workday]
+        return rows[0][0], rows[-1][0], index, workdays
+
+    def _calendar(self):
+        if not self.enabled:
+            return None
+        with self._lock:
+            if time.monotonic() < self._expires_at:
+                return self._loaded
+        loaded = self._load()
+        with self._lock:
+            self._loaded = loaded
+            self._expires_at = time.monotonic() + self.ttl
+        return loaded
+
+    def invalidate(self):
+        with self._lock:
+            self._expires_at = 0
+
+    def deadline(self, days, start=None):
+        """The midnight at which an SLA of `days` starting on `start` (default today) runs out."""
+        start = start or local_today()
+        calendar = self._calendar()
+        if calendar is None or days <= 0:
+            return start + timedelta(days=max(days, 0))
+        first, last, index, workdays = calendar
+        before = start.date() - timedelta(days=1)
+        if not first <= before <= last:
+            return start + timedelta(days=days)
+        target = index[before] + days
+        if target > len(workdays):
+            return start + timedelta(days=days)
+        return datetime.combine(workdays[target - 1] + timedelta(days=1), datetime.min.time())
+
+    def remaining(self, due_at, today=None):
+        """Working days left before `due_at`, counting today.
+
+        A deadline not reached yet counts as at least one day, so days left agree with the
+        `sla_due_at > now` filters even for deadlines set before the calendar was turned on.
+        """
+        today = today or local_today()
+        days = max((due_at - today).days, 0)
+        calendar = self._calendar()
+        if calendar is not None:
+            first, last, index, workdays = calendar
+            before = today.date() - timedelta(days=1)
+            end = (due_at - timedelta(microseconds=1)).date()
+            if first <= before <= last and first <= end <= last:
+                days = min(max(index[end] - index[before], 1), days)
+        return days
+
+
+sla_calendar = SlaCalendar()
@@ -0,0 +1,94 @@
+import threading
+import time
+from types import SimpleNamespace
+
+from extensions import db
+from models import Ticket, NomorTicket, remaining_sla
+from sla import sla_within
+
+TTL_SECONDS = 60
+
+
+def load_sla_warning_tickets():
+    """Tickets holding the lowest remaining SLA (1-3 days) of each open case."""
+    rows = (
+        db.session.query(Ticket.id, Ticket.nomor_ticket_id, Ticket.sla_due_at, Ticket.sla_days, NomorTicket.nomor_ticket)
+        .join(NomorTicket, NomorTicket.id == Ticket.nomor_ticket_id)
+        .filter(sla_within(1, 3), NomorTicket.status.in_(['aktif', 'Reopen']))
+        .all()
+    )
+
+    # Days left are derived from the deadline, so the lowest per case is picked here.
+    tickets = sorted(
+        (remaining_sla(sla_due_at, sla_days), ticket_id, case_id, nomor_ticket)
+        for ticket_id, case_id, sla_due_at, sla_days, nomor_ticket in rows
+    )
+    lowest = {}
+    for sla, _, case_id, _ in tickets:
+        lowest.setdefault(case_id, sla)
+
+    return [
+        SimpleNamespace(sla=sla, nomor_ticket=SimpleNamespace(nomor_ticket=nomor_ticket))
+        for sla, _, case_id, nomor_ticket in tickets
+        if sla == lowest[case_id]
+    ]
+
+
+class SlaWarningCache:
+    """Process-wide copy of the SLA warning panel, reloaded after `ttl` seconds or on invalidate().
+
+    Rows are detached snapshots, so they are safe to share between requests and threads.
+    Other worker processes only see an invalidation once their own TTL runs out.
+    """
+
+    def __init__(self, ttl=TTL_SECONDS):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._rows = None
+        self._expires_at = 0
+        self._generation = 0
+
+    def get(self):
+        with self._lock:
+            if self._rows is not None and time.monotonic() < self._expires_at:
+                return self._rows
+            generation = self._generation
+
+        rows = load_sla_warning_tickets()
+
+        with self._lock:
+            # An invalidate() while loading means the rows may already be stale: use them once.
+            if generation == self._generation:
+                self._rows = rows
+                self._expires_at = time.monotonic() + self.ttl
+        return rows
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+            self._rows = None
+
+
+class LazySlaWarnings:
+    """What templates get as `sla_warning_tickets`: loads only when iterated or measured."""
+
+    def __init__(self, cache):
+        self._cache = cache
+        self._rows = None
+
+    def _load(self):
+        if self._rows is None:
+            self._rows = self._cache.get()
+        return self._rows
+
+    def __iter__(self):
+        return iter(self._load())
+
+    def __len__(self):
+        return len(self._load())
+
+    def __bool__(self):
+        return bool(self._load())
+
+
+sla_warnings = SlaWarningCache()
@@ -0,0 +1,287 @@
+from datetime import datetime, date, timedelta
+
+from flask import current_app
+from sqlalchemy import select, func, literal, or_, and_, case, distinct, true
+
+from cube import CountCube, NO_DAY
+from extensions import db
+from models import Ticket, NomorTicket, TicketDaily, JAKARTA_TZ, local_now
+
+DIMENSIONS = ('nama_os', 'nama_bucket', 'kanal_pengaduan', 'jenis_pengaduan', 'status_ticket')
+
+ticket = Ticket.__table__
+ticket_daily = TicketDaily.__table__
+nomor_ticket = NomorTicket.__table__
+
+# Transactions commit a little after they stamp change_date, so each refresh looks back this far.
+STATS_CUBE_OVERLAP = timedelta(minutes=2)
+
+stats_cube = None
+stats_cube_watermark = None
+
+
+def use_ticket_daily():
+    return current_app.config.get('USE_TICKET_DAILY', False)
+
+
+def use_stats_cube():
+    return current_app.config.get('USE_STATS_CUBE', False)
+
+
+def as_day(value):
+    if isinstance(value, datetime):
+        return value.date()
+    return value
+
+
+def _daily_rows(*criteria):
+    """INSERT ... SELECT of the ticket_daily rows for the tickets matching `criteria`."""
+    day = func.date(ticket.c.tanggal)
+    dimensions = [ticket.c[name] for name in DIMENSIONS]
+    rows = select(
+        day,
+        *dimensions,
+        func.count(ticket.c.id),
+        literal(datetime.now(JAKARTA_TZ))
+    ).where(*criteria).group_by(day, *dimensions)
+    return ticket_daily.insert().from_select(
+        ['tanggal', *DIMENSIONS, 'ticket_count', 'updated_at'], rows
+    )
+
+
+def refresh_ticket_daily(connection, days):
+    """Recompute the ticket_daily rows of the given days (dates, datetimes or None) on `connection`."""
+    for day in {as_day(d) for d in days}:
+        if day is None:
+            connection.execute(ticket_daily.delete().where(ticket_daily.c.tanggal.is_(None)))
+            connection.execute(_daily_rows(ticket.c.tanggal.is_(None)))
+            continue
+        start = datetime.combine(day, datetime.min.time())
+        connection.execute(ticket_daily.delete().where(ticket_daily.c.tanggal == day))
+        connection.execute(_daily_rows(ticket.c.tanggal >= start, ticket.c.tanggal < start + timedelta(days=1)))
+
+
+def rebuild_ticket_daily(connection):
+    """Drop and recompute all of ticket_daily. Returns the number of rows written."""
+    connection.execute(ticket_daily.delete())
+    connection.execute(_daily_rows())
+    return connection.execute(select(func.count()).select_from(ticket_daily)).scalar()
+
+
+def within_days(column, start, end):
+    """`column` falls on the days start..end inclusive; always true when either bound is missing."""
+    if not (start and end):
+        return true()
+    if isinstance(column.type, db.Date):
+        return column.between(as_day(start), as_day(end))
+    return and_(
+        column >= datetime.combine(as_day(start), datetime.min.time()),
+        column < datetime.combine(as_day(end), datetime.min.time()) + timedelta(days=1)
+    )
+
+
+def _filtered(query, source, kanal, non_empty, in_filters):
+    if kanal:
+        query = query.filter(func.upper(source.kanal_pengaduan) == kanal)
+    for name in non_empty:
+        query = query.filter(getattr(source, name).isnot(None), getattr(source, name) != '')
+    for name, values in in_filters.items():
+        if values:
+            query = query.filter(getattr(source, name).in_(values))
+    return query
+
+
+def ticket_counts(group_by, start=None, end=None, kanal=None, non_empty=(), **in_filters):
+    """Ticket counts grouped by the named columns, for the days start..end inclusive.
+
+    `kanal` matches kanal_pengaduan case-insensitively, `non_empty` drops NULL and ''
+    values of the named columns and each keyword filters its column with IN (...).
+    Answered from the in-memory cube when USE_STATS_CUBE is on, otherwise in SQL.
+    Counts are per ticket (order); distinct-case counts cannot be summed from daily rows.
+    """
+    return compare_ticket_counts(group_by, [(start, end)], kanal=kanal, non_empty=non_empty, **in_filters)[0]
+
+
+def compare_ticket_counts(group_by, ranges, kanal=None, non_empty=(), **in_filters):
+    """ticket_counts() for several (start, end) ranges at once, one result list per range."""
+    if use_stats_cube():
+        if stats_cube is None:
+            load_stats_cube()
+        return [
+            stats_cube.ticket_counts(group_by, as_day(start), as_day(end), kanal=kanal, non_empty=non_empty, **in_filters)
+            for start, end in ranges
+        ]
+    return sql_compare_ticket_counts(group_by, ranges, kanal=kanal, non_empty=non_empty, **in_filters)
+
+
+def sql_ticket_counts(group_by, start=None, end=None, kanal=None, non_empty=(), **in_filters):
+    """ticket_counts() in SQL, from ticket_daily when USE_TICKET_DAILY is on, else from ticket."""
+    return sql_compare_ticket_counts(group_by, [(start, end)], kanal=kanal, non_empty=non_empty, **in_filters)[0]
+
+
+def _split_by_range(rows, width, ranges):
+    """Turn (*group, count_1, ..., count_n) rows into one [(*group, count_i)] list per range."""
+    return [
+        [(*row[:width], int(row[width + i])) for row in rows if row[width + i]]
+        for i in range(len(ranges))
+    ]
+
+
+def sql_compare_ticket_counts(group_by, ranges, kanal=None, non_empty=(), **in_filters):
+    """Ticket counts of every range in one scan: each range is a conditional SUM/COUNT
+    and rows outside all ranges are filtered out, so overlapping ranges both count a row."""
+    if use_ticket_daily():
+        source = TicketDaily
+        counted = TicketDaily.ticket_count
+        in_ranges = [within_days(TicketDaily.tanggal, start, end) for start, end in ranges]
+        totals = [func.sum(case((cond, counted), else_=0)) for cond in in_ranges]
+    else:
+        source = Ticket
+        in_ranges = [within_days(Ticket.tanggal, start, end) for start, end in ranges]
+        totals = [func.count(case((cond, Ticket.id))) for cond in in_ranges]
+
+    columns = [getattr(source, name) for name in group_by]
+    query = db.session.query(*columns, *totals).filter(or_(*in_ranges))
+    query = _filtered(query, source, kanal, non_empty, in_filters)
+
+    return _split_by_range(query.group_by(*columns).all(), len(columns), ranges)
+
+
+def compare_case_counts(group_by, ranges, kanal=None, criteria=(), **in_filters):
+    """Distinct cases (nomor_ticket_id) per group for several ranges in one scan of ticket.
+
+    `group_by` holds Ticket column names or SQL expressions on Ticket; `criteria` are extra
+    conditions on Ticket; `kanal` and `in_filters` work as in ticket_counts().
+    """
+    in_ranges = [within_days(Ticket.tanggal, start, end) for start, end in ranges]
+    totals = [func.count(distinct(case((cond, Ticket.nomor_ticket_id)))) for cond in in_ranges]
+
+    columns = [getattr(Ticket, name) if isinstance(name, str) else name for name in group_by]
+    query = db.session.query(*columns, *totals)\
+        .filter(Ticket.nomor_ticket_id.isnot(None), or_(*in_ranges), *criteria)
+    query = _filtered(query, Ticket, kanal, (), in_filters)
+
+    return _split_by_range(query.group_by(*columns).all(), len(columns), ranges)
+
+
+def distinct_values(name):
+    """Every value of a ticket column in sorted order, read from the much smaller ticket_daily when enabled."""
+    source = TicketDaily if use_ticket_daily() else Ticket
+    column = getattr(source, name)
+    return [row[0] for row in db.session.query(column).distinct().order_by(column).all()]
+
+
+def _day_criteria(column, days, is_date):
+    criteria = []
+    for day in days:
+        if day is None:
+            criteria.append(column.is_(None))
+        elif is_date:
+            criteria.append(column == day)
+        else:
+            start = datetime.combine(day, datetime.min.time())
+            criteria.append(and_(column >= start, column < start + timedelta(days=1)))
+    return or_(*criteria)
+
+
+def daily_counts(days=None):
+    """(day, *DIMENSIONS, count) rows, for all days or only the given ones."""
+    if use_ticket_daily():
+        query = select(ticket_daily.c.tanggal, *[ticket_daily.c[name] for name in DIMENSIONS], ticket_daily.c.ticket_count)
+        if days is not None:
+            query = query.where(_day_criteria(ticket_daily.c.tanggal, days, True))
+    else:
+        day = func.date(ticket.c.tanggal, type_=db.Date)
+        dimensions = [ticket.c[name] for name in DIMENSIONS]
+        query = select(day, *dimensions, func.count(ticket.c.id)).group_by(day, *dimensions)
+        if days is not None:
+            query = query.where(_day_criteria(ticket.c.tanggal, days, False))
+    return [tuple(row) for row in db.session.execute(query)]
+
+
+def changed_days(since):
+    """Days whose counts may have changed since `since`, judged by NomorTicket.change_date."""
+    day = func.date(ticket.c.tanggal, type_=db.Date)
+    query = select(day).select_from(ticket.join(nomor_ticket, nomor_ticket.c.id == ticket.c.nomor_ticket_id))\
+        .where(nomor_ticket.c.change_date >= since).distinct()
+    days = {row[0] for row in db.session.execute(query)}
+    if use_ticket_daily():
+        # Also the days a ticket moved away from, which the rollup recomputed.
+        days |= {row[0] for row in db.session.execute(
+            select(ticket_daily.c.tanggal).where(ticket_daily.c.updated_at >= since).distinct()
+        )}
+    return days
+
+
+def present_days():
+    if use_ticket_daily():
+        query = select(ticket_daily.c.tanggal).distinct()
+    else:
+        query = select(func.date(ticket.c.tanggal, type_=db.Date)).distinct()
+    return {row[0] for row in db.session.execute(query)}
+
+
+def load_stats_cube():
+    """Build the statistics cube from scratch."""
+    global stats_cube, stats_cube_watermark
+    started = local_now()
+    cube = CountCube(DIMENSIONS, fold_case=db.engine.dialect.name == 'mysql')
+    cube.replace_days(None, daily_counts())
+    stats_cube, stats_cube_watermark = cube, started
+    return cube
+
+
+def refresh_stats_cube():
+    """Reload only the days touched since the last load or refresh. Returns the number of days reloaded."""
+    global stats_cube_watermark
+    if stats_cube is None:
+        load_stats_cube()
+        return None
+
+    started = local_now()
+    days = changed_days(stats_cube_watermark - STATS_CUBE_OVERLAP)
+    present = {NO_DAY if day is None else day.toordinal() for day in present_days()}
+    for ordinal in stats_cube.day_ordinals() - present:
+        days.add(None if ordinal == NO_DAY else date.fromordinal(ordinal))
+
+    if days:
+        stats_cube.replace_days(days, daily_counts(days))
+    stats_cube_watermark = started
+    return len(days)
+
+
+def check_stats_cube():
+    """Compare a freshly loaded cube against SQL over a spread of filter combinations.
+
+    Returns a list of (arguments, cube result, SQL result) for every mismatch.
+    """
+    cube = load_stats_cube()
+    key = cube._key
+
+    os_values = [v for v in distinct_values('nama_os') if v][:2]
+    bucket_values = [v for v in distinct_values('nama_bucket') if v][:2]
+    first_day, last_day = db.session.query(func.min(Ticket.tanggal), func.max(Ticket.tanggal)).one()
+    ranges = [(None, None)]
+    if first_day and last_day:
+        middle = first_day + (last_day - first_day) / 2
+        ranges += [(first_day, last_day), (first_day, middle), (middle, middle)]
+    filter_sets = [
+        {},
+        {'non_empty': ['nama_os']},
+        {'nama_os': os_values},
+        {'nama_bucket': bucket_values, 'nama_os': os_values[:1]},
+        {'kanal': 'EMAIL'},
+        {'kanal': 'WHATSAPP', 'jenis_pengaduan': [1, 3]},
+    ]
+    groupings = [['nama_os'], ['nama_bucket'], ['nama_os', 'nama_bucket'], ['jenis_pengaduan']]
+
+    mismatches = []
+    for group_by in groupings:
+        for start, end in ranges:
+            for filters in filter_sets:
+                from_cube = cube.ticket_counts(group_by, as_day(start), as_day(end), **filters)
+                from_sql = sql_ticket_counts(group_by, start, end, **filters)
+                as_dict = lambda rows: {tuple(key(v) for v in row[:-1]): row[-1] for row in rows}
+                if as_dict(from_cube) != as_dict(from_sql):
+                    mismatches.append(((group_by, start, end, filters), from_cube, from_sql))
+    return mismatches
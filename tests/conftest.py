@@ -0,0 +1,63 @@
+import os
+import sys
+import tempfile
+from datetime import datetime
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# The app is configured at import time, so the database has to be chosen before that.
+DB_PATH = os.path.join(tempfile.mkdtemp(), 'test.db')
+os.environ['DATABASE_URL'] = 'sqlite:///' + DB_PATH
+
+from app import app as flask_app, scheduler  # noqa: E402
+from extensions import db  # noqa: E402
+from models import User, NomorTicket, Ticket  # noqa: E402
+
+if scheduler.running:
+    scheduler.shutdown(wait=False)
+
+
+@pytest.fixture
+def app():
+    flask_app.config.update(TESTING=True, USE_STATS_CUBE=False, USE_TICKET_DAILY=True)
+    with flask_app.app_context():
+        db.create_all()
+        yield flask_app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def staff(app):
+    user = User(username='staff', email='staff@example.com', phone='0', password='x', role='staff')
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+@pytest.fixture
+def add_case(staff):
+    """add_case(number, *tickets) stores a case with one ticket per dict of Ticket fields."""
+    def add(number, *tickets):
+        case = NomorTicket(nomor_ticket=number)
+        db.session.add(case)
+        db.session.flush()
+        for fields in tickets:
+            fields = {'tanggal': datetime(2026, 10, 1), 'input_by': staff.id, **fields}
+            db.session.add(Ticket(nomor_ticket_id=case.id, **fields))
+        db.session.commit()
+        return case
+    return add
+
+
+@pytest.fixture
+def client(app, staff):
+    """A test client logged in as `staff`."""
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(staff.id)
+        session['_fresh'] = True
+    return client
@@ -0,0 +1,216 @@
+import socket
+import socketserver
+import threading
+
+import pytest
+
+import cache
+from cache import MemoryBackend, FileBackend, RespBackend, RespError, ResultCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache, 'time', clock)
+    return clock
+
+
+class RespStub(socketserver.ThreadingTCPServer):
+    """Just enough of a Redis server for RespBackend: AUTH, SELECT, GET, SET ... EX and INCR."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, password=None):
+        super().__init__(('127.0.0.1', 0), RespStubHandler)
+        self.password = password
+        self.data = {}
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        host, port = self.server_address
+        return f"redis://:{self.password}@{host}:{port}/1" if self.password else f"redis://{host}:{port}/1"
+
+
+class RespStubHandler(socketserver.StreamRequestHandler):
+    def read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        args = []
+        for _ in range(int(line[1:-2])):
+            length = int(self.rfile.readline()[1:-2])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+
+    def reply(self, value):
+        if value is None:
+            self.wfile.write(b"$-1\r\n")
+        elif isinstance(value, int):
+            self.wfile.write(b":%d\r\n" % value)
+        elif isinstance(value, bytes):
+            self.wfile.write(b"$%d\r\n%s\r\n" % (len(value), value))
+        else:
+            self.wfile.write(f"{value}\r\n".encode())
+
+    def handle(self):
+        server = self.server
+        authenticated = server.password is None
+        while True:
+            args = self.read_command()
+            if args is None:
+                return
+            name = args[0].upper()
+            if name == b'AUTH':
+                authenticated = args[1].decode() == server.password
+                self.reply('+OK' if authenticated else '-WRONGPASS invalid password')
+                continue
+            if not authenticated:
+                self.reply('-NOAUTH Authentication required.')
+                continue
+            with server.lock:
+                if name == b'SELECT':
+                    self.reply('+OK')
+                elif name == b'GET':
+                    value, expires_at = server.data.get(args[1], (None, None))
+                    if expires_at is not None and cache.time.time() >= expires_at:
+                        del server.data[args[1]]
+                        value = None
+                    self.reply(value)
+                elif name == b'SET':
+                    ttl = int(args[4]) if len(args) > 4 else None
+                    server.data[args[1]] = (args[2], cache.time.time() + ttl if ttl else None)
+                    self.reply('+OK')
+                elif name == b'INCR':
+                    value = int(server.data.get(args[1], (b'0', None))[0]) + 1
+                    server.data[args[1]] = (str(value).encode(), None)
+                    self.reply(value)
+                else:
+                    self.reply(f"-ERR unknown command {name.decode()}")
+
+
+def start(server):
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+@pytest.fixture
+def resp_stub():
+    server = start(RespStub())
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(params=['memory', 'filesystem', 'resp'])
+def backend(request, tmp_path):
+    if request.param == 'memory':
+        return MemoryBackend()
+    if request.param == 'filesystem':
+        return FileBackend(str(tmp_path / 'cache'))
+    return RespBackend(request.getfixturevalue('resp_stub').url)
+
+
+def unused_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture(params=['memory', 'filesystem', 'resp'])
+def unreachable_backend(request, tmp_path, monkeypatch):
+    if request.param == 'memory':
+        backend = MemoryBackend()
+
+        def fail(*args):
+            raise OSError("unreachable")
+        for name in ('get', 'set', 'generation', 'bump_generation'):
+            monkeypatch.setattr(backend, name, fail)
+        return backend
+    if request.param == 'filesystem':
+        backend = FileBackend(str(tmp_path / 'cache'))
+        (tmp_path / 'cache').rmdir()
+        return backend
+    return RespBackend(f"redis://127.0.0.1:{unused_port()}/0", timeout=0.5)
+
+
+def result_cache_for(backend, ttl=60):
+    result_cache = ResultCache()
+    result_cache.backend = backend
+    result_cache.ttl = ttl
+    return result_cache
+
+
+class Counter:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return {'calls': self.calls}
+
+
+def test_get_returns_what_was_set(backend, clock):
+    assert backend.get('missing') is None
+    backend.set('key', {'rows': [(1, 'a')]}, 60)
+    assert backend.get('key') == {'rows': [(1, 'a')]}
+
+
+def test_entries_expire_after_their_ttl(backend, clock):
+    backend.set('key', 'value', 60)
+    clock.now += 59
+    assert backend.get('key') == 'value'
+    clock.now += 1
+    assert backend.get('key') is None
+
+
+def test_generation_bump_makes_old_keys_unreachable(backend, clock):
+    result_cache = result_cache_for(backend)
+    compute = Counter()
+
+    assert result_cache.get_or_compute('view', {'os': ['B', 'A']}, compute) == {'calls': 1}
+    # Same parameters in another order: the same entry.
+    assert result_cache.get_or_compute('view', {'os': ['A', 'B']}, compute) == {'calls': 1}
+
+    old_key = result_cache.key('view', {'os': ['A', 'B']}, backend.generation())
+    result_cache.invalidate()
+    assert result_cache.key('view', {'os': ['A', 'B']}, backend.generation()) != old_key
+    assert result_cache.get_or_compute('view', {'os': ['A', 'B']}, compute) == {'calls': 2}
+    assert compute.calls == 2
+
+
+def test_unreachable_backend_is_a_miss(unreachable_backend):
+    result_cache = result_cache_for(unreachable_backend)
+    compute = Counter()
+
+    assert result_cache.get_or_compute('view', {}, compute) == {'calls': 1}
+    assert result_cache.get_or_compute('view', {}, compute) == {'calls': 2}
+    result_cache.invalidate()
+
+
+def test_failed_auth_leaves_no_half_open_socket():
+    server = start(RespStub(password='secret'))
+    try:
+        host, port = server.server_address
+        backend = RespBackend(f"redis://:wrong@{host}:{port}/0")
+        with pytest.raises(RespError):
+            backend.get('key')
+        assert backend._local.sock is None
+
+        # The failure is a miss for the cache, and the next command connects again.
+        assert result_cache_for(backend).get_or_compute('view', {}, lambda: 'computed') == 'computed'
+        backend.password = 'secret'
+        backend.set('key', 'value', 60)
+        assert backend.get('key') == 'value'
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,89 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import select
+
+from case_status import transition_case
+from extensions import db
+from models import Ticket, NomorTicket, History, TicketDaily, CaseSummary, StaffCounter
+from rollups import rebuild_case_summary, rebuild_staff_counters
+from statistik import rebuild_ticket_daily
+
+ROLLUPS = [
+    (TicketDaily, rebuild_ticket_daily),
+    (CaseSummary, rebuild_case_summary),
+    (StaffCounter, rebuild_staff_counters),
+]
+
+
+def rollup_rows(model):
+    table = model.__table__
+    columns = [column for column in table.c if column.name != 'updated_at' and column.name != 'id']
+    return sorted(db.session.execute(select(*columns)).all(), key=repr)
+
+
+def assert_rollups_match_rebuild():
+    incremental = {model: rollup_rows(model) for model, _ in ROLLUPS}
+    with db.engine.begin() as connection:
+        for _, rebuild in ROLLUPS:
+            rebuild(connection)
+    for model, _ in ROLLUPS:
+        assert incremental[model] == rollup_rows(model), model.__tablename__
+
+
+@pytest.fixture
+def cases(add_case):
+    return [
+        add_case('AN011026001',
+                 {'tanggal': datetime(2026, 10, 10, 9), 'nama_os': 'OSA', 'order_no': 'A1', 'status_ticket': '1'},
+                 {'tanggal': datetime(2026, 10, 11, 9), 'nama_os': 'OSB', 'order_no': 'A2', 'status_ticket': '2'},
+                 {'tanggal': datetime(2026, 10, 11, 15), 'nama_os': 'OSA', 'order_no': 'A3', 'status_ticket': '1'}),
+        add_case('AN011026002',
+                 {'tanggal': datetime(2026, 10, 10, 11), 'nama_os': 'OSA', 'order_no': 'B1', 'status_ticket': '1'}),
+    ]
+
+
+@pytest.mark.parametrize('steps', [
+    [('4', 'close')],
+    [('4', 'close'), ('5', 'reopen')],
+    [('3', None), ('2', None)],
+    [('4', 'close'), ('2', None)],
+])
+def test_transition_keeps_rollups_in_step(cases, staff, steps):
+    case = cases[0]
+    for status, case_status in steps:
+        transition_case(case.id, status, staff.id, case_status=case_status)
+        db.session.commit()
+        assert_rollups_match_rebuild()
+
+    assert {t.status_ticket for t in Ticket.query.filter_by(nomor_ticket_id=case.id)} == {steps[-1][0]}
+    assert Ticket.query.filter_by(nomor_ticket_id=cases[1].id).one().status_ticket == '1'
+
+
+def test_transition_writes_history_and_case_fields(cases, staff):
+    case = cases[0]
+    changed = transition_case(case.id, '4', staff.id, case_status='close')
+    db.session.commit()
+
+    assert changed == 3
+    stored = db.session.get(NomorTicket, case.id)
+    assert stored.status == 'close'
+    assert stored.closed_ticket is not None and stored.change_date is not None
+    history = History.query.filter_by(nomor_ticket='AN011026001').all()
+    assert sorted((h.order_number, h.status_ticket) for h in history) == [('A1', '4'), ('A2', '4'), ('A3', '4')]
+
+    # Nothing left to change: no rows written.
+    assert transition_case(case.id, '4', staff.id) == 0
+
+
+def test_transition_pauses_and_resumes_sla(cases, staff):
+    case = cases[0]
+    transition_case(case.id, '4', staff.id, case_status='close')
+    db.session.commit()
+    closed = Ticket.query.filter_by(nomor_ticket_id=case.id).all()
+    assert all(t.sla_due_at is None and t.sla_days is not None for t in closed)
+
+    transition_case(case.id, '5', staff.id, case_status='reopen')
+    db.session.commit()
+    reopened = Ticket.query.filter_by(nomor_ticket_id=case.id).all()
+    assert all(t.sla_due_at is not None and t.sla_days is None for t in reopened)
@@ -0,0 +1,37 @@
+import json
+import re
+
+from extensions import db
+from models import BackgroundJob
+
+SUMMARY = {'parsed': 12, 'inserted': 9, 'duplicates': 2, 'rejected': 1}
+
+
+def add_job(staff, **fields):
+    job = BackgroundJob(id='a' * 32, kind='import', created_by=staff.id, **fields)
+    db.session.add(job)
+    db.session.commit()
+    return job
+
+
+def test_job_page_has_every_element_its_script_uses(client, staff):
+    add_job(staff, status='running', processed=5, total=12, summary=SUMMARY)
+
+    html = client.get('/jobs/' + 'a' * 32).get_data(as_text=True)
+
+    used = set(re.findall(r"getElementById\('(\w+)'\)", html))
+    assert 'job_summary' in used
+    for element_id in used:
+        assert f'id="{element_id}"' in html, element_id
+    # The summary the script renders on load.
+    assert json.dumps(SUMMARY, sort_keys=True) in html
+
+
+def test_job_status_json_reports_the_summary(client, staff):
+    add_job(staff, status='done', processed=12, total=12, summary=SUMMARY)
+
+    job = client.get('/jobs/' + 'a' * 32 + '/status').get_json()
+
+    assert job['status'] == 'done'
+    assert job['summary'] == SUMMARY
+    assert job['percent'] == 100
@@ -0,0 +1,18 @@
+import pytest
+
+from models import Ticket, blank_if_missing
+
+
+@pytest.mark.parametrize('value', [None, '', '  ', '-', 'None', ' None ', float('nan')])
+def test_missing_names_become_blank(value):
+    assert blank_if_missing(value) == ''
+
+
+@pytest.mark.parametrize('value, stored', [('OSA', 'OSA'), (123, '123'), (1.5, '1.5')])
+def test_other_names_are_kept_as_text(value, stored):
+    assert blank_if_missing(value) == stored
+
+
+def test_ticket_normalizes_names_on_assignment():
+    ticket = Ticket(nama_os=float('nan'), nama_bucket=7)
+    assert (ticket.nama_os, ticket.nama_bucket) == ('', '7')
@@ -0,0 +1,75 @@
+import itertools
+from datetime import datetime, date
+
+import pytest
+
+import statistik
+from statistik import ticket_counts, compare_ticket_counts, sql_ticket_counts, sql_compare_ticket_counts
+
+RANGES = [
+    (None, None),
+    (date(2026, 10, 1), date(2026, 10, 7)),
+    (date(2026, 10, 3), date(2026, 10, 3)),
+    (date(2026, 10, 5), date(2026, 10, 20)),
+]
+
+FILTERS = [
+    {},
+    {'non_empty': ['nama_os']},
+    {'nama_os': ['OSA', 'OSB']},
+    {'nama_os': ['OSA'], 'nama_bucket': ['B1']},
+    {'kanal': 'EMAIL'},
+    {'kanal': 'WHATSAPP', 'jenis_pengaduan': ['1', '3']},
+    {'status_ticket': ['1', '4']},
+]
+
+GROUPINGS = [['nama_os'], ['nama_bucket'], ['nama_os', 'nama_bucket'], ['jenis_pengaduan'], ['status_ticket']]
+
+
+def as_dict(rows):
+    return {tuple(row[:-1]): row[-1] for row in rows}
+
+
+@pytest.fixture
+def tickets(add_case):
+    values = itertools.cycle(itertools.product(
+        ['Email', 'WhatsApp', 'email'], ['OSA', 'OSB', ''], ['B1', 'B2'], ['1', '3', '4'], ['1', '2', '4']
+    ))
+    for number in range(24):
+        kanal, os_name, bucket, jenis, status = next(values)
+        add_case(f"AN0110260{number:02d}", *[{
+            'tanggal': datetime(2026, 10, 1 + (number + k) % 10, k),
+            'kanal_pengaduan': kanal,
+            'nama_os': os_name,
+            'nama_bucket': bucket,
+            'jenis_pengaduan': jenis,
+            'status_ticket': status if k else '5',
+        } for k in range(1 + number % 3)])
+
+
+@pytest.fixture
+def stats_cube(app, tickets):
+    app.config['USE_STATS_CUBE'] = True
+    statistik.load_stats_cube()
+    yield
+    statistik.stats_cube = None
+
+
+@pytest.mark.parametrize('group_by', GROUPINGS)
+@pytest.mark.parametrize('filters', FILTERS)
+def test_cube_matches_sql_for_one_range(stats_cube, group_by, filters):
+    for start, end in RANGES:
+        assert as_dict(ticket_counts(group_by, start, end, **filters)) == \
+            as_dict(sql_ticket_counts(group_by, start, end, **filters))
+
+
+@pytest.mark.parametrize('group_by', GROUPINGS)
+@pytest.mark.parametrize('filters', FILTERS)
+def test_cube_matches_sql_for_compared_ranges(stats_cube, group_by, filters):
+    from_cube = compare_ticket_counts(group_by, RANGES, **filters)
+    from_sql = sql_compare_ticket_counts(group_by, RANGES, **filters)
+    assert [as_dict(rows) for rows in from_cube] == [as_dict(rows) for rows in from_sql]
+
+
+def test_check_stats_cube_finds_no_mismatch(stats_cube):
+    assert statistik.check_stats_cube() == []
@@ -0,0 +1,89 @@
+from datetime import datetime
+
+from sqlalchemy import select, func
+from sqlalchemy.exc import IntegrityError, OperationalError
+
+from extensions import db
+from models import NomorTicket, TicketSequence, JAKARTA_TZ
+
+nomor_ticket = NomorTicket.__table__
+ticket_sequence = TicketSequence.__table__
+
+RETRIES = 3
+
+
+def ticket_prefix(now=None):
+    """Case numbers are AN + the Jakarta date (ddmmyy) + a running number for that day."""
+    now = now or datetime.now(JAKARTA_TZ)
+    return f"AN{now.strftime('%d%m%y')}"
+
+
+def last_ticket_number(connection, prefix):
+    # Longest first, so AN...100 sorts after AN...99.
+    last = connection.execute(
+        select(nomor_ticket.c.nomor_ticket)
+        .where(nomor_ticket.c.nomor_ticket.like(f"{prefix}%"))
+        .order_by(func.length(nomor_ticket.c.nomor_ticket).desc(), nomor_ticket.c.nomor_ticket.desc())
+        .limit(1)
+    ).scalar()
+    if last is None:
+        return 0
+    try:
+        return int(last[len(prefix):])
+    except ValueError:
+        return 0
+
+
+def _increment(connection, prefix, count):
+    """Move the day's counter on by `count` and return its new value, or None if the day has no row yet.
+
+    The UPDATE locks the row until commit, so concurrent callers queue behind each other
+    and each reads back its own value.
+    """
+    updated = connection.execute(
+        ticket_sequence.update()
+        .where(ticket_sequence.c.prefix == prefix)
+        .values(last_number=ticket_sequence.c.last_number + count, updated_at=datetime.now(JAKARTA_TZ))
+    )
+    if updated.rowcount == 0:
+        return None
+    return connection.execute(
+        select(ticket_sequence.c.last_number).where(ticket_sequence.c.prefix == prefix)
+    ).scalar()
+
+
+def _is_deadlock(error):
+    # MySQL: 1213 ER_LOCK_DEADLOCK, 1205 ER_LOCK_WAIT_TIMEOUT. The whole transaction is gone.
+    return getattr(error.orig, 'args', (None,))[:1] in [(1213,), (1205,)]
+
+
+def reserve_ticket_numbers(count, now=None):
+    """Reserve the next `count` case numbers of today and return them in order.
+
+    Runs in its own short transaction, so the counter row is only locked for the increment
+    and not for the caller's inserts. Numbers reserved by a caller that later rolls back are
+    skipped, never handed out twice.
+
+    The first reservation of a day creates the day's row, starting after any numbers already
+    stored with today's prefix. Two processes doing that at once make one of them fail, with
+    a duplicate key or, on MySQL, a deadlock on the gap lock; the loser starts over and finds
+    the row.
+    """
+    prefix = ticket_prefix(now)
+    for attempt in range(1, RETRIES + 1):
+        try:
+            with db.engine.begin() as connection:
+                last = _increment(connection, prefix, count)
+                if last is None:
+                    last = last_ticket_number(connection, prefix) + count
+                    connection.execute(ticket_sequence.insert().values(
+                        prefix=prefix,
+                        last_number=last,
+                        updated_at=datetime.now(JAKARTA_TZ)
+                    ))
+            break
+        except (IntegrityError, OperationalError) as e:
+            if attempt == RETRIES or not (isinstance(e, IntegrityError) or _is_deadlock(e)):
+                raise
+    first = last - count + 1
+    return [f"{prefix}{number:02d}" for number in range(first, last + 1)]